@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+段落对齐：把未对齐的文言文、白话文、英文段落整理成三平行段落组
+
+- 以文言文为轴，分别与白话文、英文做基于长度的动态规划对齐（Gale-Church 模型）：
+  段落长度之比近似正态分布，比例系数按整章总长度估计；
+  允许 1-1、1-2、2-1 合并以及 1-0（缺译）、0-1（多出的译文段落并入相邻段）
+- 只计算对角线附近 BAND 宽的带状区域（随两边段落数之差加宽），耗时与段落数成线性关系
+- 两组对齐结果在文言文段落边界上合并：任一组有合并时，该处的三种文本都合并为一行
+- 每行给出置信度：长度偏差在模型下出现的概率（1 表示长度完全吻合），缺译行为 0
+- 段数相同并不说明已经对齐（一处合并加一处拆分段数不变），默认总是按长度对齐；
+  确知已对齐的文本（如 corpus_export.py 导出的 CSV）可指定 aligned=True 按位置配对
+
+batch_import.py 和 migrate_data.py 生成三平行文件时使用。
+
+用法:
+    python aligner.py 文言文.txt 白话文.txt 英文.txt      # 段落以空行分隔，输出对齐结果和置信度
+    python aligner.py 文言文.txt 白话文.txt 英文.txt -o 章节.txt
+"""
+import math
+import sys
+
+from catalog import EMPTY_SEGMENT
+
+BAND = 24
+LOW_CONFIDENCE = 0.05
+
+# 各种对齐方式的先验概率（Gale & Church 1993）
+PRIORS = {(1, 1): 0.89, (1, 0): 0.0099, (0, 1): 0.0099, (2, 1): 0.0445, (1, 2): 0.0445}
+_PRIOR_COST = {bead: -math.log(p) for bead, p in PRIORS.items()}
+# 每个源语言字符对应目标长度的方差（相对于比例系数），取 Gale & Church 的 6.8。
+# 按本章 1-1 段落估计的方差偏小（长度偏差是长尾分布），会把正确的 1-1 拆成缺译 + 多出，故不采用
+VARIANCE = 6.8
+
+_INF = float('inf')
+
+
+def split_paragraphs(text):
+    """按空行切分，去掉空段落"""
+    return [p.strip() for p in (text or '').split('\n\n') if p.strip()]
+
+
+def _length(text):
+    return len(''.join(text.split()))
+
+
+def _match_probability(source_len, target_len, ratio):
+    """长度差在模型下至少这么大的概率：2 * (1 - Φ(|δ|))"""
+    if source_len == 0:
+        return 1.0 if target_len == 0 else 0.0
+    delta = (target_len - source_len * ratio) / math.sqrt(source_len * VARIANCE * ratio)
+    return math.erfc(abs(delta) / math.sqrt(2))
+
+
+def _bead_cost(source_len, target_len, ratio, bead):
+    if bead[0] == 0 or bead[1] == 0:
+        return _PRIOR_COST[bead]
+    p = _match_probability(source_len, target_len, ratio)
+    return _PRIOR_COST[bead] - math.log(p) if p > 0 else 1e6
+
+
+def align_lengths(source, target, band=BAND):
+    """
+    两组段落长度的带状动态规划对齐。
+    返回 [(源段落起点, 源段数, 目标段落起点, 目标段数, 置信度), ...]，按顺序覆盖两边全部段落
+    """
+    n, m = len(source), len(target)
+    if n == 0 or m == 0:
+        return [(i, 1, 0, 0, 0.0) for i in range(n)] + [(n, 0, j, 1, 0.0) for j in range(m)]
+    ratio = sum(target) / sum(source) if sum(source) else 1.0
+    width = band + abs(n - m)
+
+    def window(i):
+        center = i * m // n
+        return max(0, center - width), min(m, center + width)
+
+    # cost[i] / back[i]：第 i 行带内各列的最小代价和回溯方式，下标减去 lows[i]
+    lows, cost, back = [], [], []
+    beads = list(PRIORS)
+    for i in range(n + 1):
+        lo, hi = window(i)
+        lows.append(lo)
+        row_cost = [_INF] * (hi - lo + 1)
+        row_back = [None] * (hi - lo + 1)
+        for j in range(lo, hi + 1):
+            if i == 0 and j == 0:
+                row_cost[0] = 0.0
+                continue
+            best, best_bead = _INF, None
+            for bead in beads:
+                di, dj = bead
+                pi, pj = i - di, j - dj
+                if pi < 0 or pj < 0:
+                    continue
+                if pi == i:
+                    previous = row_cost[pj - lo] if pj >= lo else _INF
+                else:
+                    plo = lows[pi]
+                    k = pj - plo
+                    if k < 0 or k >= len(cost[pi]):
+                        continue
+                    previous = cost[pi][k]
+                if previous == _INF:
+                    continue
+                source_len = source[i - 1] + (source[i - 2] if di == 2 else 0) if di else 0
+                target_len = target[j - 1] + (target[j - 2] if dj == 2 else 0) if dj else 0
+                total = previous + _bead_cost(source_len, target_len, ratio, bead)
+                if total < best:
+                    best, best_bead = total, bead
+            row_cost[j - lo] = best
+            row_back[j - lo] = best_bead
+        cost.append(row_cost)
+        back.append(row_back)
+
+    if m - lows[n] >= len(cost[n]) or cost[n][m - lows[n]] == _INF:
+        # 带宽不足以到达终点（段落数极不均衡），放宽后重算
+        return align_lengths(source, target, band * 4)
+
+    result = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        di, dj = back[i][j - lows[i]]
+        i, j = i - di, j - dj
+        source_len = sum(source[i:i + di])
+        target_len = sum(target[j:j + dj])
+        confidence = _match_probability(source_len, target_len, ratio) if di and dj else 0.0
+        result.append((i, di, j, dj, confidence))
+    result.reverse()
+    return result
+
+
+class AlignedRow:
+    __slots__ = ('wenyan', 'zh', 'en', 'confidence', 'shape')
+
+    def __init__(self, wenyan, zh, en, confidence, shape):
+        self.wenyan = wenyan
+        self.zh = zh
+        self.en = en
+        self.confidence = confidence
+        self.shape = shape      # (文言文段数, 白话文段数, 英文段数)
+
+    def __repr__(self):
+        return f'<AlignedRow {self.shape} {self.confidence:.2f}>'
+
+
+def _join(paragraphs, sep):
+    # 一个段落组中每种文本只占一行
+    return sep.join(' '.join(p.split('\n')) for p in paragraphs)
+
+
+def _bead_ends(beads, n):
+    """
+    文言文段落 i 是否为某个对齐单元的最后一段（0-1 单元并入前一个单元），
+    以及每个文言文段落对应的目标段落列表
+    """
+    ends = [False] * n
+    targets = [[] for _ in range(n)]
+    confidence = [1.0] * n
+    pending = []
+    for si, sn, ti, tn, conf in beads:
+        if sn == 0:
+            # 多出的译文段落：并入前一个单元，开头时并入下一个单元
+            if si > 0:
+                targets[si - 1].extend(range(ti, ti + tn))
+                confidence[si - 1] = min(confidence[si - 1], conf)
+            else:
+                pending.extend(range(ti, ti + tn))
+            continue
+        targets[si].extend(pending + list(range(ti, ti + tn)))
+        pending = []
+        for k in range(si, si + sn):
+            confidence[k] = conf
+        ends[si + sn - 1] = True
+    return ends, targets, confidence
+
+
+def align_paragraphs(wenyan, zh, en, band=BAND):
+    """三组段落列表对齐，返回 [AlignedRow, ...]"""
+    if not wenyan:
+        # 没有文言文时无轴可依，按位置配对
+        rows = []
+        for i in range(max(len(zh), len(en))):
+            z = zh[i] if i < len(zh) else ''
+            e = en[i] if i < len(en) else ''
+            rows.append(AlignedRow('', z, e, 0.0, (0, int(bool(z)), int(bool(e)))))
+        return rows
+
+    n = len(wenyan)
+    w_len = [_length(p) for p in wenyan]
+    sides = []
+    for paragraphs in (zh, en):
+        if paragraphs:
+            beads = align_lengths(w_len, [_length(p) for p in paragraphs], band)
+            sides.append((paragraphs, _bead_ends(beads, n)))
+        else:
+            sides.append((paragraphs, None))
+
+    rows = []
+    start = 0
+    for i in range(n):
+        if not all(side is None or side[0][i] for _, side in sides):
+            continue
+        cells, shape, confidences = [], [i + 1 - start], []
+        for paragraphs, side in sides:
+            if side is None:
+                cells.append('')
+                shape.append(0)
+                continue
+            _, targets, confidence = side
+            indexes = [t for k in range(start, i + 1) for t in targets[k]]
+            cells.append(_join([paragraphs[t] for t in indexes], ' ' if paragraphs is en else ''))
+            shape.append(len(indexes))
+            confidences.append(min(confidence[start:i + 1]))
+        rows.append(AlignedRow(_join(wenyan[start:i + 1], ''), cells[0], cells[1],
+                               min(confidences) if confidences else 0.0, tuple(shape)))
+        start = i + 1
+    return rows
+
+
+def align_texts(wenyan, zh, en, band=BAND, aligned=False):
+    """
+    三种整章文本（段落以空行分隔）对齐。
+    aligned=True 表示调用方确知三者已逐段对齐：保留空段落后段数相同时按位置配对，只计算置信度；
+    段数不同时仍按长度对齐
+    """
+    texts = [(t or '').strip() for t in (wenyan, zh, en)]
+    positional = [t.split('\n\n') for t in texts]
+    counts = {len(p) for p, t in zip(positional, texts) if t}
+    if aligned and len(counts) == 1 and all(texts):
+        rows = []
+        ratios = [(_length(texts[k]) / _length(texts[0])) if _length(texts[0]) else 1.0 for k in (1, 2)]
+        for w, z, e in zip(*positional):
+            w, z, e = w.strip(), z.strip(), e.strip()
+            confidences = [_match_probability(_length(w), _length(t), r) if w and t else 0.0
+                           for t, r in ((z, ratios[0]), (e, ratios[1]))]
+            rows.append(AlignedRow(_join([w], ''), _join([z], ''), _join([e], ' '), min(confidences),
+                                   (int(bool(w)), int(bool(z)), int(bool(e)))))
+        return rows
+    return align_paragraphs(*(split_paragraphs(t) for t in texts), band=band)
+
+
+def to_three_parallel(rows):
+    """三平行文件内容：每组文言文 / 白话文 / 英文各一行；白话文为空而英文不为空时以 EMPTY_SEGMENT 占位"""
+    groups = []
+    for row in rows:
+        lines = [row.wenyan or EMPTY_SEGMENT]
+        if row.zh or row.en:
+            lines.append(row.zh or EMPTY_SEGMENT)
+        if row.en:
+            lines.append(row.en)
+        groups.append('\n'.join(lines))
+    return '\n\n'.join(groups)
+
+
+def summarize(rows):
+    """一行对齐摘要，供导入工具输出"""
+    if not rows:
+        return '无内容'
+    merged = sum(1 for r in rows if max(r.shape) > 1)
+    missing = sum(1 for r in rows if r.wenyan and (0 in r.shape[1:]))
+    low = sum(1 for r in rows if r.confidence < LOW_CONFIDENCE)
+    average = sum(r.confidence for r in rows) / len(rows)
+    return f'{len(rows)} 段，平均置信度 {average:.2f}，合并 {merged} 处，缺译 {missing} 段，低置信度 {low} 段'
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 3:
+        print('段落对齐工具使用方法:')
+        print('python aligner.py 文言文.txt 白话文.txt 英文.txt [-o 输出.txt]')
+        return
+    output = None
+    if '-o' in args:
+        i = args.index('-o')
+        output = args[i + 1]
+        del args[i:i + 2]
+    texts = []
+    for path in args[:3]:
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.append(f.read())
+
+    import time
+
+    start = time.perf_counter()
+    rows = align_texts(*texts)
+    elapsed = time.perf_counter() - start
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(to_three_parallel(rows))
+    else:
+        for n, row in enumerate(rows, 1):
+            flag = '  ?' if row.confidence < LOW_CONFIDENCE else ''
+            shape = '-'.join(map(str, row.shape))
+            print(f'{n:4d}  {shape:5s} {row.confidence:.2f}{flag}  {row.wenyan[:20]} | {row.zh[:20]} | {row.en[:30]}')
+    print(f'{summarize(rows)}（{elapsed * 1000:.0f} 毫秒）')
+
+
+if __name__ == '__main__':
+    main()
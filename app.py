@@ -1,11 +1,55 @@
-from flask import Flask, render_template, request, abort
+import hashlib
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from startup_profile import profile_from_env
+
+PROFILE = profile_from_env('app')
+
+with PROFILE.phase('import:flask'):
+    from flask import Flask, Response, render_template, request, abort, jsonify, redirect, stream_with_context
+    from jinja2 import FileSystemBytecodeCache
+
+with PROFILE.phase('import:metrics'):
+    import metrics
+    from metrics import stage
+
+# 项目模块逐个计入启动时间线（corpus_stats / tm 会导入 numpy）
+with PROFILE.phase('import:storage'):
+    import page_cache
+    import redirects
+    import storage
+    from catalog import load_book
+
+with PROFILE.phase('import:corpus_stats'):
+    import corpus_stats
+
+with PROFILE.phase('import:tm'):
+    import tm
+
+with PROFILE.phase('import:chronology'):
+    import chronology
+
+with PROFILE.phase('import:autocomplete'):
+    import autocomplete
+
+with PROFILE.phase('import:corpus_export'):
+    import corpus_export
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, 'data', 'corpus.json')
 
 app = Flask(__name__, template_folder=os.path.join(BASE_DIR, 'templates'), static_folder=os.path.join(BASE_DIR, 'static'))
+metrics.init_app(app)
+
+# 可选：把编译后的模板字节码缓存到磁盘（如 /tmp），同一实例的后续冷启动可跳过编译
+if os.environ.get('JINJA_BYTECODE_CACHE_DIR'):
+    os.makedirs(os.environ['JINJA_BYTECODE_CACHE_DIR'], exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(os.environ['JINJA_BYTECODE_CACHE_DIR'])
 
 # --- New: load raw three-parallel TXT files organized under data/raw/<book_slug>/ ---
 RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
@@ -38,132 +82,115 @@ def parse_chapters_from_text(text):
     return chapters
 
 
-def parse_three_parallel_file(file_path):
-    """
-    解析三平行格式的单个文件
-    格式: 文言文\n白话文\n英文\n\n文言文\n白话文\n英文...
-    返回: {'wenyan': str, 'zh': str, 'en': str}
-    """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-    except FileNotFoundError:
-        return {'wenyan': '', 'zh': '', 'en': ''}
-    
-    if not content:
-        return {'wenyan': '', 'zh': '', 'en': ''}
-    
-    # 按双换行分割段落组
-    paragraph_groups = content.split('\n\n')
-    
-    wenyan_parts = []
-    zh_parts = []
-    en_parts = []
-    
-    for group in paragraph_groups:
-        lines = [line.strip() for line in group.split('\n') if line.strip()]
-        
-        if len(lines) >= 3:
-            # 标准三平行格式
-            wenyan_parts.append(lines[0])
-            zh_parts.append(lines[1]) 
-            en_parts.append(lines[2])
-        elif len(lines) == 2:
-            # 可能缺少英文
-            wenyan_parts.append(lines[0])
-            zh_parts.append(lines[1])
-            en_parts.append("")
-        elif len(lines) == 1:
-            # 只有一行，可能是标题或单独内容
-            wenyan_parts.append(lines[0])
-            zh_parts.append("")
-            en_parts.append("")
-    
-    return {
-        'wenyan': '\n\n'.join(wenyan_parts),
-        'zh': '\n\n'.join(zh_parts),
-        'en': '\n\n'.join(en_parts)
-    }
-
 def load_books_from_raw():
     """
     扫描新的三级目录结构: data/raw/<book>/<category>/<chapter>.txt
     每个txt文件是三平行格式的单个章节
-    返回: [{'id': book_id, 'title': book_title, 'categories': [{'id': cat_id, 'title': cat_title, 'chapters': [...]}]}]
+    返回: [Book, ...]（见 catalog.py）
     """
     books = []
     if not os.path.isdir(RAW_DIR):
         return books
-    
-    # 四史的分类配置
-    book_configs = {
-        "shiji": {"name": "史记", "categories": {"benji": "本纪", "shijia": "世家", "liezhuan": "列传", "shu": "书", "biao": "表"}},
-        "hanshu": {"name": "汉书", "categories": {"benji": "本纪", "biao": "表", "zhi": "志", "liezhuan": "列传"}},
-        "houhanshu": {"name": "后汉书", "categories": {"leibian": "类传"}},
-        "sanguozhi": {"name": "三国志", "categories": {"wei": "魏书", "shu": "蜀书", "wu": "吴书"}}
-    }
-    
+
     for book_id in sorted(os.listdir(RAW_DIR)):
         book_path = os.path.join(RAW_DIR, book_id)
         if not os.path.isdir(book_path):
             continue
-        
-        # 获取书籍配置
-        book_config = book_configs.get(book_id, {"name": book_id, "categories": {}})
-        book_title = book_config["name"]
-        
-        # 加载分类
-        categories = []
-        for cat_dir in sorted(os.listdir(book_path)):
-            cat_path = os.path.join(book_path, cat_dir)
-            if not os.path.isdir(cat_path):
-                continue
-            
-            cat_title = book_config["categories"].get(cat_dir, cat_dir)
-            
-            # 加载该分类下的章节
-            chapters = []
-            chapter_files = [f for f in os.listdir(cat_path) if f.endswith('.txt')]
-            
-            for i, filename in enumerate(sorted(chapter_files)):
-                file_path = os.path.join(cat_path, filename)
-                
-                # 从文件名提取章节标题
-                chapter_title = filename[:-4]  # 去掉.txt后缀
-                # 去掉可能的序号前缀 (如 "01_标题" -> "标题")
-                if '_' in chapter_title:
-                    chapter_title = chapter_title.split('_', 1)[1]
-                
-                # 解析三平行内容
-                content = parse_three_parallel_file(file_path)
-                
-                chapters.append({
-                    'id': i + 1,
-                    'title': chapter_title,
-                    'wenyan': content['wenyan'],
-                    'zh': content['zh'], 
-                    'en': content['en']
-                })
-            
-            if chapters:  # 只添加有章节的分类
-                categories.append({
-                    'id': cat_dir,
-                    'title': cat_title,
-                    'chapters': chapters
-                })
-        
-        if categories:  # 只添加有内容的书籍
-            books.append({
-                'id': book_id,
-                'title': book_title,
-                'categories': categories
-            })
-    
+        with PROFILE.phase(f'load_book:{book_id}'):
+            book = load_book(book_id, book_path)
+        if book:
+            books.append(book)
+
     return books
 
 
+def precompile_templates(env):
+    """启动时编译全部模板并放入 Jinja 缓存，避免冷启动后的首个请求承担编译开销"""
+    for name in env.list_templates(extensions=['html']):
+        env.get_template(name)
+
+
+# 首页 / 书籍页 / 分类页的渲染结果按目录数据版本缓存（见 page_cache.py）
+STORE = None
+BOOKS = []
+DATA_VERSION = ''
+PAGES = page_cache.PageCache()
+# 章节页较大，按最近最少使用保留 CHAPTER_CACHE_SIZE 章；CHAPTER_PREFETCH=0 关闭相邻章节预取
+CHAPTER_PAGES = page_cache.PageCache(max_entries=int(os.environ.get('CHAPTER_CACHE_SIZE', '64')))
+CHAPTER_PREFETCH = os.environ.get('CHAPTER_PREFETCH', '1') != '0'
+CHAPTER_VIEWS = ('aligned', 'columns')
+_PREFETCH = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prefetch')
+_prefetching = set()
+
+# 就绪状态：catalog 为目录已加载；search / stats 为对应索引已预热（见 warm_up）
+READY = {'catalog': False, 'search': False, 'stats': False, 'tm': False, 'chronology': False}
+WARMING = threading.Event()
+_load_lock = threading.Lock()
+
+
+def load_store():
+    """
+    加载语料并设置 STORE / BOOKS / DATA_VERSION，重复调用时直接返回
+    STORAGE_BACKEND=sqlite 时只读取目录结构，章节正文按需从数据库查询
+    """
+    global STORE, BOOKS, DATA_VERSION
+    with _load_lock:
+        if STORE is not None:
+            return STORE
+        start = time.perf_counter()
+        with PROFILE.phase('load_books'):
+            store = storage.backend_from_env(load_books_from_raw)
+            books = store.list_books()
+        metrics.CORPUS_LOAD_SECONDS.set(time.perf_counter() - start)
+        DATA_VERSION = page_cache.data_version(books)
+        PAGES.set_version(DATA_VERSION)
+        CHAPTER_PAGES.set_version(DATA_VERSION)
+        BOOKS = books
+        STORE = store
+        READY['catalog'] = True
+        return store
+
+
+def warm_up():
+    """
+    后台预热（asgi.py 在服务器开始监听后调用）：加载目录，再构建检索索引和统计。
+    预热期间页面请求返回 503，检索在索引建好之前返回 503
+    """
+    WARMING.set()
+    try:
+        load_store()
+        PROFILE.write()
+        with PROFILE.phase('warm:search'):
+            STORE.warm()
+        READY['search'] = True
+        with PROFILE.phase('warm:stats'):
+            get_stats()
+        READY['stats'] = True
+        with PROFILE.phase('warm:tm'):
+            get_translation_memory()
+        READY['tm'] = True
+        with PROFILE.phase('warm:chronology'):
+            get_chronology()
+        READY['chronology'] = True
+    finally:
+        WARMING.clear()
+
+
 # Load books once at startup (for prototype). Could be reloaded on demand.
-BOOKS = load_books_from_raw()
+# APP_DEFER_LOAD=1（asgi.py 设置）时推迟到 warm_up 中加载，服务器无需等待语料即可开始监听
+if os.environ.get('APP_DEFER_LOAD') != '1':
+    load_store()
+
+with PROFILE.phase('compile_templates'):
+    precompile_templates(app.jinja_env)
+PROFILE.write()
+
+# 旧的按位置编号的章节 URL -> 新 id（见 redirects.py）
+REDIRECTS = redirects.load_redirects()
+
+# 模板内容参与章节页 ETag，模板修改后缓存随之失效
+with open(os.path.join(BASE_DIR, 'templates', 'chapter.html'), 'rb') as _f:
+    CHAPTER_TEMPLATE_HASH = hashlib.sha1(_f.read()).hexdigest()[:8]
 
 
 
@@ -175,95 +202,399 @@ def load_corpus():
         return []
 
 
-def search_corpus(query):
-    if not query:
-        return load_corpus()
-    q = query.lower()
-    results = []
-    for entry in load_corpus():
-        if q in (entry.get('title', '') or '').lower():
-            results.append(entry)
-            continue
-        for k in ('text_1', 'text_2', 'text_3'):
-            if q in (entry.get(k, '') or '').lower():
-                results.append(entry)
-                break
-    return results
+WARMUP_ENDPOINTS = {'readyz', 'metrics', 'static'}
+
+
+def _retry_later(message):
+    response = jsonify({'error': message, 'ready': READY})
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
+
+
+@app.before_request
+def _require_catalog():
+    """目录加载完成前，除就绪检查、监控和静态文件外的请求返回 503"""
+    if STORE is None and request.endpoint not in WARMUP_ENDPOINTS:
+        return _retry_later('语料加载中，请稍后重试')
+
+
+@app.route('/readyz')
+def readyz():
+    """就绪检查：目录加载完成后返回 200；索引预热进度见 ready 字段"""
+    return jsonify({'ready': READY, 'warming': WARMING.is_set()}), 200 if READY['catalog'] else 503
+
+
+def cached_page(key, template, **context):
+    """
+    从页面缓存返回响应：客户端支持 gzip 时直接发送缓存的压缩结果，ETag 匹配时返回 304
+    """
+    with stage('cache'):
+        page, hit = PAGES.get_or_render(key, lambda: render_template(template, **context))
+    metrics.record_cache('pages', hit)
+    return page_response(page)
+
+
+def response_etag(etag):
+    """本次响应的 ETag：客户端支持 gzip 时发送压缩结果，ETag 带上编码后缀"""
+    return page_cache.coded_etag(etag, 'gzip' in request.accept_encodings)
+
+
+def page_response(page):
+    """缓存页面的响应：ETag 匹配时返回 304，客户端支持 gzip 时发送压缩结果"""
+    etag = response_etag(page.etag)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif 'gzip' in request.accept_encodings:
+        response = Response(page.gzip_body, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(page.body, mimetype='text/html')
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    return response
 
 
 @app.route('/')
 def index():
-    q = request.args.get('q', '').strip()
-    selected_history = request.args.get('history', '')
-    entries = search_corpus(q)
-    if selected_history:
-        entries = [e for e in entries if e.get('history') == selected_history]
-    histories = sorted({e.get('history', '未分类') for e in load_corpus()})
     # Home: show site intro and book list
-    return render_template('home.html', books=BOOKS)
+    return cached_page('home', 'home.html', books=BOOKS)
+
+
+def find_book(book_id):
+    for book in BOOKS:
+        if book.id == book_id:
+            return book
+    return None
+
+
+def find_category(book_id, category_id):
+    """返回 (book, category)，找不到时对应位置为 None"""
+    book = find_book(book_id)
+    if book is None:
+        return None, None
+    return book, book.category(category_id)
 
 
 @app.route('/book/<book_id>/')
 @app.route('/book/<book_id>')
 def book_page(book_id):
     """显示书籍的分类列表"""
-    for book in BOOKS:
-        if book['id'] == book_id:
-            return render_template('book.html', book=book)
-    abort(404)
+    with stage('lookup'):
+        book = find_book(book_id)
+    if book is None:
+        abort(404)
+    return cached_page(f'book/{book.id}', 'book.html', book=book)
 
 
 @app.route('/book/<book_id>/<category_id>/')
 @app.route('/book/<book_id>/<category_id>')
 def category_page(book_id, category_id):
     """显示分类的章节列表"""
-    for book in BOOKS:
-        if book['id'] == book_id:
-            for category in book['categories']:
-                if category['id'] == category_id:
-                    return render_template('category.html', book=book, category=category)
-    abort(404)
+    with stage('lookup'):
+        book, category = find_category(book_id, category_id)
+    if category is None:
+        abort(404)
+    return cached_page(f'book/{book.id}/{category.id}', 'category.html', book=book, category=category)
+
+
+def chapter_etag(book, category, chapter_idx, view=CHAPTER_VIEWS[0]):
+    """
+    章节页 ETag：本章标题和内容哈希 + 前后章节 id + 模板版本 + 显示方式。
+    新增章节只改变它自己和相邻章节的 ETag，其余章节页的缓存保持有效；
+    因此章节页不显示随插入位置变化的章序号（chapter.num，只在分类列表中显示）
+    """
+    chapters = category.chapters
+    prev_id = chapters[chapter_idx - 1].id if chapter_idx > 0 else ''
+    next_id = chapters[chapter_idx + 1].id if chapter_idx < len(chapters) - 1 else ''
+    chapter = chapters[chapter_idx]
+    key = '\0'.join((book.title, category.title, chapter.title, chapter.content_hash,
+                     prev_id, next_id, CHAPTER_TEMPLATE_HASH, view))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+
+
+def render_chapter(book, category, chapter_idx, view):
+    """渲染章节页 HTML（请求线程和预取线程共用，只需应用上下文）"""
+    chapters = category.chapters
+    chapter = STORE.full_chapter(book, category, chapters[chapter_idx])
+    # 计算前后章节链接
+    prev_url = None
+    next_url = None
+    if chapter_idx > 0:
+        prev_url = storage.chapter_url(book.id, category.id, chapters[chapter_idx - 1].id)
+    if chapter_idx < len(chapters) - 1:
+        next_url = storage.chapter_url(book.id, category.id, chapters[chapter_idx + 1].id)
+    return render_template('chapter.html',
+                           book=book,
+                           category=category,
+                           chapter=chapter,
+                           prev_url=prev_url,
+                           next_url=next_url,
+                           view=view,
+                           static=False)
+
+
+def _chapter_key(book, category, chapter_idx, view):
+    return book.id, category.id, category.chapters[chapter_idx].id, view
+
+
+def cached_chapter(book, category, chapter_idx, view):
+    """从章节页缓存取出或渲染，返回 (CachedPage, 是否命中)"""
+    key = _chapter_key(book, category, chapter_idx, view)
+    return CHAPTER_PAGES.get_or_render(key, lambda: render_chapter(book, category, chapter_idx, view),
+                                       etag=chapter_etag(book, category, chapter_idx, view))
+
+
+def _prefetch_chapters(book, category, indexes, view):
+    with app.app_context():
+        for i in indexes:
+            try:
+                cached_chapter(book, category, i, view)
+            except Exception:  # 预取失败不影响读者，正式请求时会重新渲染并报告错误
+                app.logger.exception('预取章节失败: %s/%s #%d', book.id, category.id, i)
+            finally:
+                _prefetching.discard(_chapter_key(book, category, i, view))
+
 
+def prefetch_neighbours(book, category, chapter_idx, view):
+    """在后台渲染前后两章并放入缓存，顺序阅读时下一次请求直接命中"""
+    wanted = []
+    for i in (chapter_idx + 1, chapter_idx - 1):
+        if 0 <= i < len(category.chapters):
+            key = _chapter_key(book, category, i, view)
+            if key not in CHAPTER_PAGES and key not in _prefetching:
+                _prefetching.add(key)
+                wanted.append(i)
+    if wanted:
+        _PREFETCH.submit(_prefetch_chapters, book, category, wanted, view)
 
-@app.route('/book/<book_id>/<category_id>/chapter/<int:chapter_id>/')
-@app.route('/book/<book_id>/<category_id>/chapter/<int:chapter_id>')
+
+@app.route('/book/<book_id>/<category_id>/chapter/<chapter_id>/')
+@app.route('/book/<book_id>/<category_id>/chapter/<chapter_id>')
 def chapter_page(book_id, category_id, chapter_id):
-    """显示具体章节的三平行内容"""
-    for book in BOOKS:
-        if book['id'] == book_id:
-            for category in book['categories']:
-                if category['id'] == category_id:
-                    for chapter in category['chapters']:
-                        if chapter['id'] == chapter_id:
-                            # 计算前后章节链接
-                            chapters = category['chapters']
-                            chapter_idx = next(i for i, ch in enumerate(chapters) if ch['id'] == chapter_id)
-                            
-                            prev_url = None
-                            next_url = None
-                            if chapter_idx > 0:
-                                prev_ch = chapters[chapter_idx - 1]
-                                prev_url = f"/book/{book_id}/{category_id}/chapter/{prev_ch['id']}/"
-                            if chapter_idx < len(chapters) - 1:
-                                next_ch = chapters[chapter_idx + 1]
-                                next_url = f"/book/{book_id}/{category_id}/chapter/{next_ch['id']}/"
-                            
-                            # 标准化章节数据格式，兼容模板
-                            chapter_display = {
-                                'id': chapter['id'], 
-                                'title': chapter.get('title', ''), 
-                                'wenyan': chapter.get('wenyan', ''), 
-                                'z': chapter.get('zh', ''),  # 模板中使用 'z' 
-                                'en': chapter.get('en', '')
-                            }
-                            
-                            return render_template('chapter.html', 
-                                                 book=book, 
-                                                 category=category,
-                                                 chapter=chapter_display, 
-                                                 prev_url=prev_url, 
-                                                 next_url=next_url)
-    abort(404)
+    """显示具体章节的三平行内容：默认逐段对照，?view=columns 为三列"""
+    with stage('lookup'):
+        book, category = find_category(book_id, category_id)
+        chapter_idx = category.chapter_index(chapter_id) if category else None
+    if chapter_idx is None:
+        # 旧的按位置编号的 URL 永久重定向到新 id
+        new_id = REDIRECTS.get(book_id, {}).get(category_id, {}).get(chapter_id)
+        if new_id is not None and category is not None and category.chapter_index(new_id) is not None:
+            return redirect(storage.chapter_url(book_id, category_id, new_id), code=301)
+        abort(404)
+    view = request.args.get('view')
+    if view not in CHAPTER_VIEWS:
+        view = CHAPTER_VIEWS[0]
+
+    etag = response_etag(chapter_etag(book, category, chapter_idx, view))
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.vary.add('Accept-Encoding')
+    else:
+        with stage('render'):
+            page, hit = cached_chapter(book, category, chapter_idx, view)
+        metrics.record_cache('chapters', hit)
+        response = page_response(page)
+    response.set_etag(etag)
+    response.headers['X-Content-Hash'] = category.chapters[chapter_idx].content_hash
+    if chapter_idx < len(category.chapters) - 1:
+        next_url = storage.chapter_url(book_id, category_id, category.chapters[chapter_idx + 1].id)
+        response.headers['Link'] = f'<{quote(next_url)}>; rel=prefetch'
+    if CHAPTER_PREFETCH:
+        prefetch_neighbours(book, category, chapter_idx, view)
+    return response
+
+
+_STATS = None
+_stats_lock = threading.Lock()
+
+
+def get_stats():
+    """语料统计只在首次访问时计算（章节级结果另有磁盘缓存）"""
+    global _STATS
+    metrics.record_cache('stats', _STATS is not None)
+    if _STATS is None:
+        # 并发的首次请求只计算一次，也不会同时写 stats.json.tmp
+        with _stats_lock:
+            if _STATS is None:
+                _STATS = corpus_stats.build_stats(BOOKS, fetch=STORE.full_chapter)
+    return _STATS
+
+
+@app.route('/stats/')
+@app.route('/stats')
+def stats_page():
+    """语料统计：字数、段数、高频字和翻译覆盖率"""
+    if WARMING.is_set() and not READY['stats']:
+        return _retry_later('统计预热中，请稍后重试')
+    with stage('stats'):
+        stats = get_stats()
+    READY['stats'] = True
+    if request.args.get('format') == 'json':
+        return jsonify(stats)
+    with stage('render'):
+        return render_template('stats.html', stats=stats)
+
+
+@app.route('/search')
+def search():
+    """段落检索（JSON）：/search?q=...&history=<book_id>&limit=50"""
+    q = request.args.get('q', '').strip()
+    book_id = request.args.get('history') or None
+    limit = max(1, min(request.args.get('limit', storage.SEARCH_LIMIT, type=int), 500))
+    if WARMING.is_set() and not READY['search']:
+        return _retry_later('检索索引预热中，请稍后重试')
+    with stage('search'):
+        results = STORE.search(q, book_id=book_id, limit=limit)
+    READY['search'] = True
+    return jsonify({'query': q, 'history': book_id, 'backend': STORE.name, 'results': results})
+
+
+_TM = None
+_tm_lock = threading.Lock()
+
+TM_MAX_K = 20
+TM_MAX_SENTENCES = 2000
+
+
+def get_translation_memory():
+    """翻译记忆索引在首次使用时构建（ASGI 模式下由 warm_up 预先构建）"""
+    global _TM
+    metrics.record_cache('tm', _TM is not None)
+    if _TM is None:
+        with _tm_lock:
+            if _TM is None:
+                _TM = tm.TranslationMemory(STORE.iter_chapters())
+    return _TM
+
+
+@app.route('/tm', methods=['GET', 'POST'])
+def translation_memory():
+    """
+    翻译记忆（JSON）：
+    GET  /tm?q=赐民爵一级&k=5                 单句，返回 {'query', 'matches'}
+    POST /tm {"text": "整章草稿"} 或 {"sentences": [...]}，可带 "k"；返回 {'results': [{'sentence', 'matches'}]}
+    """
+    if WARMING.is_set() and not READY['tm']:
+        return _retry_later('翻译记忆预热中，请稍后重试')
+    payload = request.get_json(silent=True) if request.method == 'POST' else None
+    if payload is None:
+        payload = {}
+    elif not isinstance(payload, dict):
+        abort(400)
+    k = payload.get('k', request.args.get('k', tm.TOP_K, type=int))
+    # bool 是 int 的子类，true 不能当作 1
+    if not isinstance(k, int) or isinstance(k, bool):
+        abort(400)
+    k = max(1, min(k, TM_MAX_K))
+
+    with stage('tm'):
+        memory = get_translation_memory()
+        READY['tm'] = True
+        if request.method == 'GET':
+            q = request.args.get('q', '').strip()
+            return jsonify({'query': q, 'matches': memory.lookup(q, k)})
+        sentences = payload.get('sentences')
+        if sentences is None:
+            sentences = tm.split_sentences(payload.get('text') or request.form.get('text', ''))
+        if not isinstance(sentences, list) or not all(isinstance(x, str) for x in sentences):
+            abort(400)
+        if len(sentences) > TM_MAX_SENTENCES:
+            abort(413)
+        return jsonify({'results': memory.lookup_batch(sentences, k)})
+
+
+_AUTOCOMPLETE = None
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+def get_autocomplete():
+    """输入提示索引只依赖目录（标题），每个数据版本构建一次"""
+    global _AUTOCOMPLETE
+    index = _AUTOCOMPLETE
+    hit = index is not None and index.version == DATA_VERSION
+    metrics.record_cache('autocomplete', hit)
+    if not hit:
+        index = _AUTOCOMPLETE = autocomplete.Autocomplete(BOOKS, version=DATA_VERSION)
+    return index
+
+
+@app.route('/autocomplete')
+def autocomplete_view():
+    """标题和人名输入提示（JSON）：/autocomplete?q=lp&limit=10，汉字或拼音首字母 / 全拼前缀"""
+    q = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', autocomplete.LIMIT, type=int), AUTOCOMPLETE_MAX_LIMIT))
+    with stage('autocomplete'):
+        results = get_autocomplete().lookup(q, limit)
+    return jsonify({'query': q, 'results': results})
+
+
+_CHRONOLOGY = None
+_chronology_lock = threading.Lock()
+
+
+def get_chronology():
+    """纪年与人名地名索引在首次使用时构建（章节级抽取结果另有磁盘缓存）"""
+    global _CHRONOLOGY
+    metrics.record_cache('chronology', _CHRONOLOGY is not None)
+    if _CHRONOLOGY is None:
+        with _chronology_lock:
+            if _CHRONOLOGY is None:
+                _CHRONOLOGY = chronology.build_chronology(BOOKS, fetch=STORE.full_chapter)
+    return _CHRONOLOGY
+
+
+@app.route('/timeline/')
+@app.route('/timeline')
+def timeline_page():
+    """
+    时间线：/timeline/?from=-206&to=-195&entity=刘邦&history=shiji&format=json
+    年份为公元纪年，公元前记为负数；只给 entity 不给年份范围时列出提到该人 / 地的全部段落
+    """
+    if WARMING.is_set() and not READY['chronology']:
+        return _retry_later('时间线预热中，请稍后重试')
+    start = request.args.get('from', type=int)
+    end = request.args.get('to', type=int)
+    entity = request.args.get('entity', '').strip() or None
+    book_id = request.args.get('history') or None
+    with stage('chronology'):
+        index = get_chronology()
+        READY['chronology'] = True
+        if entity and start is None and end is None:
+            name, mentions = index.entity(entity, book_id)
+            events = []
+        else:
+            name, mentions = (index.extractor.resolve(entity), None) if entity else (None, None)
+            events = index.range(start, end, book_id, entity)
+    if request.args.get('format') == 'json':
+        return jsonify({'from': start, 'to': end, 'history': book_id, 'entity': name,
+                        'events': events, 'mentions': mentions})
+    with stage('render'):
+        return render_template('timeline.html', groups=chronology.group_by_year(events), mentions=mentions,
+                               entity=name, start=start, end=end, book_id=book_id, books=BOOKS,
+                               entities=index.entity_counts()[:60], static=False)
+
+
+@app.route('/export/<fmt>')
+def export_corpus(fmt):
+    """流式下载对齐语料：/export/jsonl|tmx|csv?book=&category=&gzip=1"""
+    if fmt not in corpus_export.EXPORTERS:
+        abort(404)
+    book_id = request.args.get('book') or None
+    category_id = request.args.get('category') or None
+    if book_id and find_category(book_id, category_id)[0 if not category_id else 1] is None:
+        abort(404)
+    compress = request.args.get('gzip') in ('1', 'true', 'yes')
+
+    chapters = STORE.iter_chapters(book_id, category_id)
+    filename = '-'.join(filter(None, ('corpus', book_id, category_id))) + '.' + fmt
+    mimetype = corpus_export.EXPORTERS[fmt][1]
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    body = stream_with_context(corpus_export.export(fmt, chapters, compress))
+    return Response(body, mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 
 @app.route('/entry/<entry_id>')
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASGI 入口：以异步服务器运行 app.py
+
+- 服务器启动（lifespan startup）后立即开始监听，语料加载、检索索引和统计在后台线程中预热；
+  预热期间 /readyz 返回 503，页面请求返回 503 + Retry-After（见 app.warm_up）
+- 每个请求在线程池中执行 Flask 应用，章节文件 / SQLite 读取不会阻塞事件循环；
+  响应体由事件循环发送，慢速客户端只占用一个协程而不占用工作线程
+- 流式响应（/export）逐块在线程池中生成、逐块发送。每个请求的各步骤（调用应用、取下一块、close）
+  都在同一个 contextvars 上下文中执行：stream_with_context 压入的 Flask 上下文保存在 contextvars 中，
+  各步骤可能落在不同线程上，不共用上下文时最后的出栈会失败、响应被截断
+
+不依赖 asgiref，只需要一个 ASGI 服务器（如 uvicorn）:
+    pip install uvicorn
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+    python asgi.py                     # 同上，端口取 PORT 环境变量
+    python asgi.py --check             # 比较流式导出经 ASGI 和 WSGI 得到的字节，不需要 uvicorn
+
+ASGI_THREADS 设置线程池大小（默认 16）。
+"""
+import asyncio
+import contextvars
+import hashlib
+import io
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('APP_DEFER_LOAD', '1')
+
+import app as flask_app  # noqa: E402  需在设置 APP_DEFER_LOAD 之后导入
+
+THREADS = int(os.environ.get('ASGI_THREADS', '16'))
+EXECUTOR = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='wsgi')
+
+_END = object()
+
+
+def build_environ(scope, body):
+    """按 PEP 3333 由 ASGI HTTP scope 构造 WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1] or 80),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = 'HTTP_' + name
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def _start(environ):
+    """在工作线程中调用 WSGI 应用，返回 (状态行, 响应头, 响应体迭代器, 第一块数据)"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = status
+        started['headers'] = headers
+
+    result = flask_app.app(environ, start_response)
+    iterator = iter(result)
+    first = next(iterator, _END)
+    return started['status'], started['headers'], result, iterator, first
+
+
+def _close(result):
+    close = getattr(result, 'close', None)
+    if close is not None:
+        close()
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def http(scope, receive, send):
+    body = await _read_body(receive)
+    if body is None:
+        return
+    loop = asyncio.get_running_loop()
+    environ = build_environ(scope, body)
+    # 本请求的所有步骤共用一个上下文，不论由哪个工作线程执行
+    ctx = contextvars.copy_context()
+    status, headers, result, iterator, chunk = await loop.run_in_executor(EXECUTOR, ctx.run, _start, environ)
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+        })
+        # 预取下一块，最后一块带 more_body=False 发送；没有响应体时发送一个空块结束响应
+        if chunk is _END:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        while chunk is not _END:
+            nxt = await loop.run_in_executor(EXECUTOR, ctx.run, next, iterator, _END)
+            if chunk or nxt is _END:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': nxt is not _END})
+            chunk = nxt
+    finally:
+        await loop.run_in_executor(EXECUTOR, ctx.run, _close, result)
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # 不等待预热完成：服务器立即开始接受连接
+            threading.Thread(target=flask_app.warm_up, name='warm-up', daemon=True).start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            EXECUTOR.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        await http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    else:
+        raise NotImplementedError(f"不支持的 ASGI 协议: {scope['type']}")
+
+
+CHECK_PATHS = ('/export/csv', '/export/tmx?book=shiji', '/export/jsonl')
+
+
+async def _fetch(path, chunks):
+    """不经网络直接调用 ASGI 应用，响应体各块追加到 chunks，返回状态码"""
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode('latin-1'),
+             'headers': [], 'http_version': '1.1', 'scheme': 'http'}
+    requested = False
+    status = None
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            await asyncio.Event().wait()    # 客户端不会断开
+        requested = True
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        else:
+            chunks.append(message.get('body', b''))
+
+    await http(scope, receive, send)
+    return status
+
+
+def check(paths=CHECK_PATHS):
+    """流式导出经 ASGI 与经 Flask 测试客户端（WSGI）的字节必须一致，返回不一致的路径列表"""
+    flask_app.warm_up()
+    client = flask_app.app.test_client()
+    failures = []
+    for path in paths:
+        expected = client.get(path)
+        chunks, error = [], ''
+        try:
+            status = asyncio.run(_fetch(path, chunks))
+        except Exception as e:  # 响应中途出错也按不一致报告，并给出已收到的字节数
+            status, error = None, f'，出错: {e!r}'
+        body = b''.join(chunks)
+        ok = not error and status == expected.status_code and body == expected.data
+        digest = hashlib.sha1(body).hexdigest()[:12]
+        print(f"{'OK ' if ok else '不一致'} {path}: ASGI {status} {len(body)} 字节 ({digest})，"
+              f"WSGI {expected.status_code} {len(expected.data)} 字节{error}")
+        if not ok:
+            failures.append(path)
+    return failures
+
+
+def main():
+    if '--check' in sys.argv[1:]:
+        paths = [a for a in sys.argv[1:] if a != '--check'] or CHECK_PATHS
+        sys.exit(1 if check(paths) else 0)
+    try:
+        import uvicorn
+    except ImportError:
+        print('需要安装 ASGI 服务器: pip install uvicorn')
+        sys.exit(1)
+    uvicorn.run(application, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), lifespan='on')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+章节标题和人名的输入提示（自动补全）
+
+- 检索键：章节标题、去掉“列传 / 本纪 / 第N”等结构词后的主体（如“廉颇蔺相如”）及其后缀
+  （输入“蔺相如”也能找到），标题中出现的人名（data/gazetteer.json 的别名和规范名，
+  输入“刘邦”可找到《高帝纪》），以及各键的全拼和拼音首字母（“lplxr”“lianpo”）
+- 索引是按键排序的数组，前缀查询用二分查找定位后顺序扫描，单次查询远低于 1 毫秒
+- 拼音优先使用 pypinyin（可选依赖，按词组判断多音字）；未安装时使用 data/pinyin.tsv，
+  表中没有的字不生成拼音键，汉字前缀匹配不受影响
+
+用法:
+    python autocomplete.py 廉颇
+    python autocomplete.py lp
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+from bisect import bisect_left
+from itertools import islice, product
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # pypinyin 可选，缺失时使用 data/pinyin.tsv
+    lazy_pinyin = None
+
+from normalize import fold_chinese
+from storage import chapter_url
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PINYIN_PATH = os.path.join(BASE_DIR, 'data', 'pinyin.tsv')
+GAZETTEER_PATH = os.path.join(BASE_DIR, 'data', 'gazetteer.json')
+
+LIMIT = 10
+MAX_SCAN = 400           # 单次查询最多扫描的键数（单字母首字母查询可能命中很多键）
+MAX_READINGS = 4         # 多音字组合出的拼音读法上限
+MIN_SUFFIX = 2           # 标题主体的后缀至少两个字
+
+_KIND_ORDER = {'person': 0, 'chapter': 1}
+_TITLE_PREFIX_RE = re.compile(r'^(?:本纪|列传|世家|书|表|纪|传|志)[\s\-]+')
+_TITLE_SUFFIX_RE = re.compile(r'(?:本纪|列传|世家|传|纪|志|表|书)?(?:第?[一二三四五六七八九十百]+)?(?:\s*[上中下])?$')
+_HAN_RE = re.compile(r'[㐀-鿿\U00020000-\U0002ffff]')
+
+_pinyin_table = None
+
+
+def load_pinyin(path=PINYIN_PATH):
+    """读取拼音表，返回 {字: [读音, ...]}"""
+    table = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) >= 2 and len(parts[0]) == 1:
+                    table[parts[0]] = parts[1].split()
+    except FileNotFoundError:
+        pass
+    return table
+
+
+def readings(text):
+    """汉字串的拼音读法 [[音节, ...], ...]；有字查不到读音时返回 []"""
+    global _pinyin_table
+    if lazy_pinyin is not None:
+        syllables = lazy_pinyin(text, style=Style.NORMAL, errors=lambda chars: [None] * len(chars))
+        return [syllables] if all(syllables) else []
+    if _pinyin_table is None:
+        _pinyin_table = load_pinyin()
+    options = []
+    for ch in text:
+        if ch not in _pinyin_table:
+            return []
+        options.append(_pinyin_table[ch])
+    return [list(r) for r in islice(product(*options), MAX_READINGS)]
+
+
+def pinyin_keys(text):
+    """全拼和拼音首字母检索键"""
+    keys = set()
+    for syllables in readings(text):
+        keys.add(''.join(syllables))
+        keys.add(''.join(s[0] for s in syllables))
+    return keys
+
+
+def title_core(title):
+    """去掉标题中的结构词：'列传 廉颇蔺相如列传第二十一' -> '廉颇蔺相如'，'纪-高帝纪 上' -> '高帝'"""
+    core = _TITLE_PREFIX_RE.sub('', title.strip())
+    core = _TITLE_SUFFIX_RE.sub('', core).strip()
+    return core or title
+
+
+def normalize_prefix(text):
+    """查询和检索键的统一形式：折叠异体字、去空白和连接符、拉丁字母转小写"""
+    return re.sub(r'[\s\-·]+', '', fold_chinese(text)).lower()
+
+
+def load_persons(path=GAZETTEER_PATH):
+    """{规范名: [别名, ...]}（别名含规范名本身）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            persons = json.load(f).get('persons', {})
+    except FileNotFoundError:
+        return {}
+    return {name: sorted(set([name] + info.get('aliases', []))) for name, info in persons.items()}
+
+
+class Autocomplete:
+    def __init__(self, books, persons=None, version=''):
+        """
+        books: 目录（只需标题，不读正文）；persons: {规范名: [别名, ...]}，默认读取 gazetteer；
+        version: 构建时的数据版本，app.py 据此判断是否需要重建（不写入 to_json）
+        """
+        self.version = version
+        self.entries = []   # [(显示文字, 类别, 书名, URL)]
+        pairs = set()       # {(检索键, 条目序号)}
+        persons = load_persons() if persons is None else persons
+        alias_to_name = {normalize_prefix(a): name for name, aliases in persons.items() for a in aliases}
+        aliases_by_length = sorted(alias_to_name, key=len, reverse=True)
+
+        for name, aliases in persons.items():
+            eid = self._add(name, 'person', '', f'/timeline/?entity={name}')
+            for alias in aliases:
+                self._add_keys(pairs, eid, normalize_prefix(alias))
+
+        for book in books:
+            for category in book.categories:
+                for chapter in category.chapters:
+                    eid = self._add(chapter.title, 'chapter', book.title,
+                                    chapter_url(book.id, category.id, chapter.id))
+                    title = normalize_prefix(chapter.title)
+                    core = normalize_prefix(title_core(chapter.title))
+                    pairs.add((title, eid))
+                    for i in range(len(core) - MIN_SUFFIX + 1 if len(core) > MIN_SUFFIX else 1):
+                        self._add_keys(pairs, eid, core[i:])
+                    # 标题中的人名：别名和规范名都可以找到本章
+                    for alias in aliases_by_length:
+                        if alias in core:
+                            self._add_keys(pairs, eid, alias)
+                            self._add_keys(pairs, eid, normalize_prefix(alias_to_name[alias]))
+
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.ids = [eid for _, eid in pairs]
+
+    def _add(self, label, kind, book_title, url):
+        self.entries.append((label, kind, book_title, url))
+        return len(self.entries) - 1
+
+    @staticmethod
+    def _add_keys(pairs, eid, key):
+        if not key:
+            return
+        pairs.add((key, eid))
+        if _HAN_RE.search(key):
+            for pinyin_key in pinyin_keys(key):
+                pairs.add((pinyin_key, eid))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, query, limit=LIMIT):
+        """
+        前缀匹配，返回 [{'label', 'kind', 'book', 'url', 'match'}, ...]
+        排序：完全匹配优先，其次人名优先于章节，再按匹配键的长度
+        """
+        prefix = normalize_prefix(query)
+        if not prefix:
+            return []
+        best = {}
+        start = bisect_left(self.keys, prefix)
+        for i in range(start, min(start + MAX_SCAN, len(self.keys))):
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            eid = self.ids[i]
+            rank = (key != prefix, _KIND_ORDER[self.entries[eid][1]], len(key), eid)
+            if eid not in best or rank < best[eid][0]:
+                best[eid] = (rank, key)
+        results = []
+        for eid, (_, key) in sorted(best.items(), key=lambda item: item[1][0])[:limit]:
+            label, kind, book_title, url = self.entries[eid]
+            results.append({'label': label, 'kind': kind, 'book': book_title, 'url': url, 'match': key})
+        return results
+
+    def to_json(self):
+        """
+        静态站点导出：条目表 + 按键排序的 [键, 条目序号]，前端可同样二分查找。
+        version 取自索引内容本身：正文修改不改变导出文件，增量发布时不必重新上传
+        """
+        data = {
+            'entries': [list(e) for e in self.entries],
+            'keys': [[key, eid] for key, eid in zip(self.keys, self.ids)],
+        }
+        digest = hashlib.sha1(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        return {'version': digest.hexdigest()[:12], **data}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('输入提示工具使用方法:')
+        print('python autocomplete.py 廉颇')
+        print('python autocomplete.py lp')
+        return
+    import time
+
+    from catalog import load_book
+
+    raw_dir = os.path.join(BASE_DIR, 'data', 'raw')
+    books = [load_book(name, os.path.join(raw_dir, name)) for name in sorted(os.listdir(raw_dir))
+             if os.path.isdir(os.path.join(raw_dir, name))]
+    books = [book for book in books if book]
+    index = Autocomplete(books)
+    query = ' '.join(sys.argv[1:])
+    start = time.perf_counter()
+    results = index.lookup(query)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f'{len(index.entries)} 个条目，{len(index)} 个检索键；查询耗时 {elapsed:.3f} 毫秒'
+          f"（拼音: {'pypinyin' if lazy_pinyin is not None else 'data/pinyin.tsv'}）")
+    for hit in results:
+        where = f"{hit['book']} · " if hit['book'] else ''
+        print(f"  [{hit['kind']}] {where}{hit['label']}  ({hit['match']})  {hit['url']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,8 @@ import re
 import pandas as pd
 from pathlib import Path
 
+import aligner
+
 RAW_DIR = "data/raw"
 
 # 四史分类配置
@@ -34,43 +36,23 @@ def safe_filename(text, max_length=50):
 def create_three_parallel_content(wenyan, zh, en):
     """
     创建三平行格式内容
-    将三种语言按段落对应组织
+    三种文本按段落长度对齐（见 aligner.py），某种语言多出或合并了段落时不会错位
     """
     if not any([wenyan, zh, en]):
         return ""
-    
-    # 分割段落
-    w_paragraphs = [p.strip() for p in (wenyan or "").split('\n\n') if p.strip()]
-    z_paragraphs = [p.strip() for p in (zh or "").split('\n\n') if p.strip()]
-    e_paragraphs = [p.strip() for p in (en or "").split('\n\n') if p.strip()]
-    
-    # 对齐段落数量
-    max_paras = max(len(w_paragraphs), len(z_paragraphs), len(e_paragraphs))
-    
-    parallel_groups = []
-    for i in range(max_paras):
-        w = w_paragraphs[i] if i < len(w_paragraphs) else ""
-        z = z_paragraphs[i] if i < len(z_paragraphs) else ""
-        e = e_paragraphs[i] if i < len(e_paragraphs) else ""
-        
-        # 组成三平行段落组
-        group_lines = []
-        if w: group_lines.append(w)
-        if z: group_lines.append(z)
-        if e: group_lines.append(e)
-        
-        if group_lines:
-            parallel_groups.append('\n'.join(group_lines))
-    
-    return '\n\n'.join(parallel_groups)
+    return aligner.to_three_parallel(aligner.align_texts(wenyan, zh, en))
 
-def import_from_csv(csv_path):
+def import_from_csv(csv_path, aligned=False):
     """
     从CSV文件导入语料
     CSV格式：book,category,chapter_num,title,wenyan,zh,en
+    aligned=True：三列已逐段对齐（如 corpus_export.py csv 导出的文件），按位置配对
     """
     print(f"正在从CSV导入: {csv_path}")
     
+    # 整章文本可能超过 csv 模块默认的 128KB 字段上限（如 corpus_export.py 导出的长章节）
+    csv.field_size_limit(2**31 - 1)
+    
     imported_count = 0
     with open(csv_path, 'r', encoding='utf-8') as f:
         reader = csv.DictReader(f)
@@ -107,14 +89,15 @@ def import_from_csv(csv_path):
                 filename = f"{safe_filename(title)}.txt"
             
             # 创建三平行内容
-            content = create_three_parallel_content(wenyan, zh, en)
+            rows = aligner.align_texts(wenyan, zh, en, aligned=aligned)
+            content = aligner.to_three_parallel(rows)
             
             # 写入文件
             file_path = os.path.join(category_dir, filename)
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(content)
             
-            print(f"  导入: {book_id}/{category_id}/{filename}")
+            print(f"  导入: {book_id}/{category_id}/{filename}（{aligner.summarize(rows)}）")
             imported_count += 1
     
     print(f"CSV导入完成，共导入 {imported_count} 个章节")
@@ -166,14 +149,15 @@ def import_from_excel(excel_path):
             filename = f"{safe_filename(title)}.txt"
         
         # 创建三平行内容
-        content = create_three_parallel_content(wenyan, zh, en)
+        rows = aligner.align_texts(wenyan, zh, en)
+        content = aligner.to_three_parallel(rows)
         
         # 写入文件
         file_path = os.path.join(category_dir, filename)
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(content)
         
-        print(f"  导入: {book_id}/{category_id}/{filename}")
+        print(f"  导入: {book_id}/{category_id}/{filename}（{aligner.summarize(rows)}）")
         imported_count += 1
     
     print(f"Excel导入完成，共导入 {imported_count} 个章节")
@@ -268,7 +252,7 @@ def main():
     
     if len(sys.argv) < 2:
         print("批量导入工具使用方法:")
-        print("python batch_import.py csv <csv_file>                 # 从CSV导入")
+        print("python batch_import.py csv <csv_file> [--aligned]     # 从CSV导入（--aligned: 三列已逐段对齐）")
         print("python batch_import.py excel <excel_file>             # 从Excel导入")
         print("python batch_import.py txt <txt_file> <book> <category> [title]  # 导入单个txt")
         print("python batch_import.py template [output.csv]          # 创建CSV模板")
@@ -278,7 +262,7 @@ def main():
     command = sys.argv[1].lower()
     
     if command == "csv" and len(sys.argv) >= 3:
-        import_from_csv(sys.argv[2])
+        import_from_csv(sys.argv[2], aligned='--aligned' in sys.argv[3:])
     elif command == "excel" and len(sys.argv) >= 3:
         import_from_excel(sys.argv[2])
     elif command == "txt" and len(sys.argv) >= 5:
@@ -1,12 +1,43 @@
 """Generate static site into out/ by rendering Flask templates with data from data/raw/.
 
-Usage: python build_static.py
+Usage: python build_static.py [--profile-startup [profile.json]] [--check-budget [budget.json]]
+                              [--published [manifest.json]]
+
+Every build writes out/manifest.json (path, sha1 and size of each output file, see publish.py).
+--published compares it with the previously published manifest (default: the manifest of the
+previous build in out/) and writes the added/changed/removed lists to out/delta.json.
 """
+import json
 import os
 import shutil
+from xml.sax.saxutils import escape, quoteattr
 import sys
 import traceback
-from jinja2 import Environment, FileSystemLoader
+
+import startup_profile
+from startup_profile import profile_from_env
+
+PROFILE = profile_from_env('build')
+
+with PROFILE.phase('import:jinja2'):
+    from jinja2 import Environment, FileSystemLoader
+
+# 项目模块逐个计入启动时间线（corpus_stats 会导入 numpy）
+with PROFILE.phase('import:storage'):
+    import catalog
+    import publish
+    import redirects
+    import storage
+    from catalog import Book, Category, Chapter
+
+with PROFILE.phase('import:corpus_stats'):
+    import corpus_stats
+
+with PROFILE.phase('import:chronology'):
+    import chronology
+
+with PROFILE.phase('import:autocomplete'):
+    import autocomplete
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUT_DIR = os.path.join(BASE_DIR, 'out')
@@ -15,52 +46,69 @@ STATIC_DIR = os.path.join(BASE_DIR, 'static')
 RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
 
 
-def parse_three_parallel_file(file_path):
+def load_book(book_id, book_path):
     """
-    解析三平行格式的单个文件
-    格式: 文言文\n白话文\n英文\n\n文言文\n白话文\n英文...
-    返回: {'wenyan': str, 'zh': str, 'en': str}
+    加载单本书：优先使用新的三级目录结构，回退到旧格式；没有内容时返回 None
     """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-    except FileNotFoundError:
-        return {'wenyan': '', 'zh': '', 'en': ''}
+    # 检查是否是新的三级结构
+    has_categories = any(os.path.isdir(os.path.join(book_path, item)) 
+                       for item in os.listdir(book_path) 
+                       if not item.endswith('.txt'))
     
-    if not content:
-        return {'wenyan': '', 'zh': '', 'en': ''}
+    if has_categories:
+        # 新的三级结构
+        return catalog.load_book(book_id, book_path)
     
-    # 按双换行分割段落组
-    paragraph_groups = content.split('\n\n')
-    
-    wenyan_parts = []
-    zh_parts = []
-    en_parts = []
-    
-    for group in paragraph_groups:
-        lines = [line.strip() for line in group.split('\n') if line.strip()]
+    else:
+        # 旧的格式：wenyan.txt, zh.txt, en.txt
+        files = {
+            'wenyan': os.path.join(book_path, 'wenyan.txt'),
+            'zh': os.path.join(book_path, 'zh.txt'),
+            'en': os.path.join(book_path, 'en.txt'),
+        }
+        contents = {}
+        for k, p in files.items():
+            try:
+                with open(p, 'r', encoding='utf-8') as f:
+                    contents[k] = f.read()
+            except FileNotFoundError:
+                contents[k] = ''
         
-        if len(lines) >= 3:
-            # 标准三平行格式
-            wenyan_parts.append(lines[0])
-            zh_parts.append(lines[1]) 
-            en_parts.append(lines[2])
-        elif len(lines) == 2:
-            # 可能缺少英文
-            wenyan_parts.append(lines[0])
-            zh_parts.append(lines[1])
-            en_parts.append("")
-        elif len(lines) == 1:
-            # 只有一行，可能是标题或单独内容
-            wenyan_parts.append(lines[0])
-            zh_parts.append("")
-            en_parts.append("")
-    
-    return {
-        'wenyan': '\n\n'.join(wenyan_parts),
-        'zh': '\n\n'.join(zh_parts),
-        'en': '\n\n'.join(en_parts)
-    }
+        # simple chapter split by lines beginning with '## '
+        def parse(text):
+            lines = text.splitlines()
+            chapters = []
+            cur_title = ''
+            cur_lines = []
+            for line in lines:
+                if line.startswith('## '):
+                    if cur_lines or cur_title:
+                        chapters.append({'title': cur_title.strip(), 'content': '\n'.join(cur_lines).strip()})
+                    cur_title = line[3:].strip()
+                    cur_lines = []
+                else:
+                    cur_lines.append(line)
+            if cur_lines or cur_title:
+                chapters.append({'title': cur_title.strip(), 'content': '\n'.join(cur_lines).strip()})
+            if not chapters:
+                return [{'title': '', 'content': text.strip()}]
+            return chapters
+
+        ch_w = parse(contents['wenyan'])
+        ch_z = parse(contents['zh'])
+        ch_e = parse(contents['en'])
+        n = min(len(ch_w), len(ch_z), len(ch_e)) if (ch_w and ch_z and ch_e) else max(len(ch_w), len(ch_z), len(ch_e))
+        chapters = []
+        for i in range(n):
+            w = ch_w[i]['content'] if i < len(ch_w) else ''
+            z = ch_z[i]['content'] if i < len(ch_z) else ''
+            e = ch_e[i]['content'] if i < len(ch_e) else ''
+            title = (ch_w[i]['title'] if i < len(ch_w) else '') or (ch_z[i]['title'] if i < len(ch_z) else '') or (ch_e[i]['title'] if i < len(ch_e) else '') or f'第{i+1}章'
+            chapters.append(Chapter(i+1, title, w, z, e))
+        
+        # 对旧格式创建兼容的结构
+        return Book(book_id, book_id, [Category('default', '章节', chapters)])
+
 
 def load_books_from_raw():
     """
@@ -69,139 +117,24 @@ def load_books_from_raw():
     books = []
     if not os.path.isdir(RAW_DIR):
         return books
-    
-    # 四史的分类配置
-    book_configs = {
-        "shiji": {"name": "史记", "categories": {"benji": "本纪", "shijia": "世家", "liezhuan": "列传", "shu": "书", "biao": "表"}},
-        "hanshu": {"name": "汉书", "categories": {"benji": "本纪", "biao": "表", "zhi": "志", "liezhuan": "列传"}},
-        "houhanshu": {"name": "后汉书", "categories": {"leibian": "类传"}},
-        "sanguozhi": {"name": "三国志", "categories": {"wei": "魏书", "shu": "蜀书", "wu": "吴书"}}
-    }
-    
+
     for book_id in sorted(os.listdir(RAW_DIR)):
         book_path = os.path.join(RAW_DIR, book_id)
         if not os.path.isdir(book_path):
             continue
-        
-        # 检查是否是新的三级结构
-        has_categories = any(os.path.isdir(os.path.join(book_path, item)) 
-                           for item in os.listdir(book_path) 
-                           if not item.endswith('.txt'))
-        
-        if has_categories:
-            # 新的三级结构
-            book_config = book_configs.get(book_id, {"name": book_id, "categories": {}})
-            book_title = book_config["name"]
-            
-            categories = []
-            for cat_dir in sorted(os.listdir(book_path)):
-                cat_path = os.path.join(book_path, cat_dir)
-                if not os.path.isdir(cat_path):
-                    continue
-                
-                cat_title = book_config["categories"].get(cat_dir, cat_dir)
-                
-                # 加载该分类下的章节
-                chapters = []
-                chapter_files = [f for f in os.listdir(cat_path) if f.endswith('.txt')]
-                
-                for i, filename in enumerate(sorted(chapter_files)):
-                    file_path = os.path.join(cat_path, filename)
-                    
-                    # 从文件名提取章节标题
-                    chapter_title = filename[:-4]  # 去掉.txt后缀
-                    # 去掉可能的序号前缀 (如 "01_标题" -> "标题")
-                    if '_' in chapter_title:
-                        chapter_title = chapter_title.split('_', 1)[1]
-                    
-                    # 解析三平行内容
-                    content = parse_three_parallel_file(file_path)
-                    
-                    chapters.append({
-                        'id': i + 1,
-                        'title': chapter_title,
-                        'wenyan': content['wenyan'],
-                        'zh': content['zh'], 
-                        'en': content['en']
-                    })
-                
-                if chapters:  # 只添加有章节的分类
-                    categories.append({
-                        'id': cat_dir,
-                        'title': cat_title,
-                        'chapters': chapters
-                    })
-            
-            if categories:  # 只添加有内容的书籍
-                books.append({
-                    'id': book_id,
-                    'title': book_title,
-                    'categories': categories
-                })
-        
-        else:
-            # 旧的格式：wenyan.txt, zh.txt, en.txt
-            files = {
-                'wenyan': os.path.join(book_path, 'wenyan.txt'),
-                'zh': os.path.join(book_path, 'zh.txt'),
-                'en': os.path.join(book_path, 'en.txt'),
-            }
-            contents = {}
-            for k, p in files.items():
-                try:
-                    with open(p, 'r', encoding='utf-8') as f:
-                        contents[k] = f.read()
-                except FileNotFoundError:
-                    contents[k] = ''
-            
-            # simple chapter split by lines beginning with '## '
-            def parse(text):
-                lines = text.splitlines()
-                chapters = []
-                cur_title = ''
-                cur_lines = []
-                for line in lines:
-                    if line.startswith('## '):
-                        if cur_lines or cur_title:
-                            chapters.append({'title': cur_title.strip(), 'content': '\n'.join(cur_lines).strip()})
-                        cur_title = line[3:].strip()
-                        cur_lines = []
-                    else:
-                        cur_lines.append(line)
-                if cur_lines or cur_title:
-                    chapters.append({'title': cur_title.strip(), 'content': '\n'.join(cur_lines).strip()})
-                if not chapters:
-                    return [{'title': '', 'content': text.strip()}]
-                return chapters
-
-            ch_w = parse(contents['wenyan'])
-            ch_z = parse(contents['zh'])
-            ch_e = parse(contents['en'])
-            n = min(len(ch_w), len(ch_z), len(ch_e)) if (ch_w and ch_z and ch_e) else max(len(ch_w), len(ch_z), len(ch_e))
-            chapters = []
-            for i in range(n):
-                w = ch_w[i]['content'] if i < len(ch_w) else ''
-                z = ch_z[i]['content'] if i < len(ch_z) else ''
-                e = ch_e[i]['content'] if i < len(ch_e) else ''
-                title = (ch_w[i]['title'] if i < len(ch_w) else '') or (ch_z[i]['title'] if i < len(ch_z) else '') or (ch_e[i]['title'] if i < len(ch_e) else '') or f'第{i+1}章'
-                chapters.append({'id': i+1, 'title': title, 'wenyan': w, 'zh': z, 'en': e})
-            
-            # 对旧格式创建兼容的结构
-            books.append({
-                'id': book_id, 
-                'title': book_id, 
-                'categories': [{
-                    'id': 'default',
-                    'title': '章节',
-                    'chapters': chapters
-                }]
-            })
-    
+        with PROFILE.phase(f'load_book:{book_id}'):
+            book = load_book(book_id, book_path)
+        if book:
+            books.append(book)
+
     return books
 
 
-def render_site(books):
+def render_site(books, store):
     env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    with PROFILE.phase('compile_templates'):
+        for name in env.list_templates(extensions=['html']):
+            env.get_template(name)
     # copy static
     out_static = os.path.join(OUT_DIR, 'static')
     if os.path.exists(out_static):
@@ -213,6 +146,30 @@ def render_site(books):
     with open(os.path.join(OUT_DIR, 'index.html'), 'w', encoding='utf-8') as f:
         f.write(home_tpl.render(books=books))
 
+    # render stats page (+ raw JSON for scripts)
+    stats = corpus_stats.build_stats(books, fetch=store.full_chapter)
+    stats_dir = os.path.join(OUT_DIR, 'stats')
+    os.makedirs(stats_dir, exist_ok=True)
+    with open(os.path.join(stats_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(env.get_template('stats.html').render(stats=stats))
+    # computed / cached 只描述本次构建的缓存命中情况，不写入输出，以免内容未变时清单也变化
+    with open(os.path.join(OUT_DIR, 'stats.json'), 'w', encoding='utf-8') as f:
+        json.dump({k: v for k, v in stats.items() if k not in ('computed', 'cached')}, f, ensure_ascii=False)
+
+    # render full timeline (filtering only on the dynamic site; the JSON is for scripts)
+    index = chronology.build_chronology(books, fetch=store.full_chapter)
+    timeline_dir = os.path.join(OUT_DIR, 'timeline')
+    os.makedirs(timeline_dir, exist_ok=True)
+    with open(os.path.join(timeline_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(env.get_template('timeline.html').render(
+            groups=chronology.group_by_year(index.range()), mentions=None, entity=None, static=True))
+    with open(os.path.join(OUT_DIR, 'timeline.json'), 'w', encoding='utf-8') as f:
+        json.dump(index.to_json(), f, ensure_ascii=False)
+
+    # autocomplete index for titles and people (same sorted-key layout as /autocomplete)
+    with open(os.path.join(OUT_DIR, 'autocomplete.json'), 'w', encoding='utf-8') as f:
+        json.dump(autocomplete.Autocomplete(books).to_json(), f, ensure_ascii=False, separators=(',', ':'))
+
     # load templates
     book_tpl = env.get_template('book.html')
     category_tpl = env.get_template('category.html')
@@ -220,70 +177,131 @@ def render_site(books):
     
     for book in books:
         # render book page (shows categories)
-        book_dir = os.path.join(OUT_DIR, 'book', book['id'])
+        book_dir = os.path.join(OUT_DIR, 'book', book.id)
         os.makedirs(book_dir, exist_ok=True)
         with open(os.path.join(book_dir, 'index.html'), 'w', encoding='utf-8') as f:
             f.write(book_tpl.render(book=book))
 
         # render each category and its chapters
-        for category in book['categories']:
+        for category in book.categories:
             # render category page (shows chapter list)
-            category_dir = os.path.join(book_dir, category['id'])
+            category_dir = os.path.join(book_dir, category.id)
             os.makedirs(category_dir, exist_ok=True)
             with open(os.path.join(category_dir, 'index.html'), 'w', encoding='utf-8') as f:
                 f.write(category_tpl.render(book=book, category=category))
 
             # render individual chapters
-            for i, chapter in enumerate(category['chapters']):
-                chapter_dir = os.path.join(category_dir, 'chapter', str(chapter['id']))
+            for i, chapter in enumerate(category.chapters):
+                chapter = store.full_chapter(book, category, chapter)
+                chapter_dir = os.path.join(category_dir, 'chapter', str(chapter.id))
                 os.makedirs(chapter_dir, exist_ok=True)
                 
                 # calculate prev/next URLs within the category
-                chapters = category['chapters']
+                chapters = category.chapters
                 prev_url = None
                 next_url = None
                 if i > 0:
-                    prev_ch = chapters[i - 1]
-                    prev_url = f"/book/{book['id']}/{category['id']}/chapter/{prev_ch['id']}/"
+                    prev_url = f"/book/{book.id}/{category.id}/chapter/{chapters[i - 1].id}/"
                 if i < len(chapters) - 1:
-                    next_ch = chapters[i + 1]
-                    next_url = f"/book/{book['id']}/{category['id']}/chapter/{next_ch['id']}/"
-                
-                # normalize chapter data for template
-                chapter_display = {
-                    'id': chapter['id'],
-                    'title': chapter.get('title', ''),
-                    'wenyan': chapter.get('wenyan', ''),
-                    'z': chapter.get('zh', ''),  # template expects 'z' not 'zh'
-                    'en': chapter.get('en', '')
-                }
+                    next_url = f"/book/{book.id}/{category.id}/chapter/{chapters[i + 1].id}/"
                 
                 chapter_path = os.path.join(chapter_dir, 'index.html')
                 with open(chapter_path, 'w', encoding='utf-8') as f:
                     f.write(chapter_tpl.render(
                         book=book,
                         category=category,
-                        chapter=chapter_display,
+                        chapter=chapter,
                         prev_url=prev_url,
-                        next_url=next_url
+                        next_url=next_url,
+                        view='aligned',
+                        static=True
                     ))
 
+    write_redirect_stubs(books)
+
 
-def main():
+REDIRECT_STUB = ('<!doctype html>\n<html lang="zh-CN"><head><meta charset="utf-8">'
+                 '<meta http-equiv="refresh" content="0; url={url}">'
+                 '<link rel="canonical" href={href}><title>页面已移动</title></head>'
+                 '<body><p>本章网址已更改：<a href={href}>{text}</a></p></body></html>\n')
+
+
+def write_redirect_stubs(books):
+    """在旧的按位置编号的章节路径生成跳转页（静态托管无法返回 301）"""
+    count = 0
+    for book_id, category_id, old_id, new_id in redirects.iter_redirects(redirects.load_redirects()):
+        book = next((b for b in books if b.id == book_id), None)
+        category = book.category(category_id) if book else None
+        # 旧 id 恰好是现有章节的 id，或者目标章节已不存在时不生成
+        if category is None or category.chapter_index(old_id) is not None or category.chapter_index(new_id) is None:
+            continue
+        url = storage.chapter_url(book_id, category_id, new_id)
+        stub_dir = os.path.join(OUT_DIR, 'book', book_id, category_id, 'chapter', old_id)
+        os.makedirs(stub_dir, exist_ok=True)
+        with open(os.path.join(stub_dir, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write(REDIRECT_STUB.format(url=url, href=quoteattr(url), text=escape(url)))
+        count += 1
+    return count
+
+
+def write_manifest(published=None):
+    """写出发布清单；给出上次发布的清单时同时写出差异 out/delta.json"""
+    manifest = publish.build_manifest(OUT_DIR)
+    publish.write_manifest(manifest, os.path.join(OUT_DIR, publish.MANIFEST_NAME))
+    if published is None:
+        return manifest
+    delta = publish.diff_manifests(published, manifest)
+    publish.write_manifest(delta, os.path.join(OUT_DIR, publish.DELTA_NAME))
+    print('Delta against published manifest:', publish.summarize(delta, len(manifest['files'])))
+    return manifest
+
+
+def _option_value(args, flag, default):
+    """读取形如 --flag [value] 的可选参数；未给出时返回 None，只给出开关时返回 default"""
+    if flag not in args:
+        return None
+    i = args.index(flag)
+    if i + 1 < len(args) and not args[i + 1].startswith('--'):
+        return args[i + 1]
+    return default
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    profile_path = _option_value(args, '--profile-startup', 'startup_profile_build.json')
+    budget_path = _option_value(args, '--check-budget', startup_profile.DEFAULT_BUDGET_PATH)
+    published_path = _option_value(args, '--published', os.path.join(OUT_DIR, publish.MANIFEST_NAME))
+    if profile_path:
+        PROFILE.output_path = profile_path
+    elif budget_path and not PROFILE.enabled:
+        PROFILE.output_path = 'startup_profile_build.json'
+
+    # 上次发布的清单可能就在 out/ 中，需在清空前读取
+    published = publish.load_manifest(published_path) if published_path else None
     if os.path.exists(OUT_DIR):
         shutil.rmtree(OUT_DIR)
     os.makedirs(OUT_DIR, exist_ok=True)
     try:
         print('Python executable:', sys.executable)
         print('Python version:', sys.version)
-        books = load_books_from_raw()
-        render_site(books)
+        # STORAGE_BACKEND=sqlite 时从数据库读取（见 storage.py），默认直接解析 data/raw
+        with PROFILE.phase('load_books'):
+            store = storage.backend_from_env(load_books_from_raw)
+            books = store.list_books()
+        with PROFILE.phase('render_site'):
+            render_site(books, store)
+        with PROFILE.phase('manifest'):
+            write_manifest(published)
         print('Static site generated in', OUT_DIR)
     except Exception:
         print('ERROR: build failed, traceback follows:')
         traceback.print_exc()
         raise
 
+    profile = PROFILE.write()
+    if budget_path and not startup_profile.report_budget(profile, startup_profile.load_budget(budget_path)):
+        sys.exit(1)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,298 @@
+"""
+语料目录（书籍 / 分类 / 章节）的数据结构与加载
+
+目录结构: data/raw/<book>/<category>/<chapter>.txt，每个 txt 文件是三平行格式的单个章节。
+app.py、build_static.py 以及各命令行工具共用这里的解析和加载逻辑。
+
+Book / Category / Chapter 使用 __slots__，id 和标题经过 sys.intern，
+模板按属性访问（book.title、chapter.z 等），渲染时无需再复制成字典。
+
+章节 id 由文件名决定，与目录中其他文件无关：有数字前缀时取数字（"01_刑法志" -> "1"），
+否则取文件名（空白换成 "-"）。新增章节不会改变已有章节的 URL；
+chapter.num 是章节在分类中的序号，只用于显示。
+"""
+import hashlib
+import os
+import re
+import sys
+
+# 四史的分类配置
+BOOK_CONFIGS = {
+    "shiji": {"name": "史记", "categories": {"benji": "本纪", "shijia": "世家", "liezhuan": "列传", "shu": "书", "biao": "表"}},
+    "hanshu": {"name": "汉书", "categories": {"benji": "本纪", "biao": "表", "zhi": "志", "liezhuan": "列传"}},
+    "houhanshu": {"name": "后汉书", "categories": {"leibian": "类传"}},
+    "sanguozhi": {"name": "三国志", "categories": {"wei": "魏书", "shu": "蜀书", "wu": "吴书"}}
+}
+
+
+# 三平行文件中单独一行 "-" 表示该语言此段为空（白话文缺译而英文不缺时用于占位，见 aligner.py）
+EMPTY_SEGMENT = '-'
+
+
+def text_hash(wenyan, zh, en):
+    """章节内容哈希（sha1 前 16 位），用作缓存键和 ETag"""
+    h = hashlib.sha1()
+    for text in (wenyan, zh, en):
+        h.update(text.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()[:16]
+
+
+class Chapter:
+    """
+    单个章节；三种文本各自以 '\\n\\n' 连接段落，段落位置一一对应
+    content_hash 未给出时按正文计算；只有标题的目录章节（见 storage.py）由调用方传入
+    """
+
+    __slots__ = ('id', 'title', 'wenyan', 'zh', 'en', 'num', 'content_hash')
+
+    def __init__(self, id, title, wenyan='', zh='', en='', num=None, content_hash=None):
+        self.id = sys.intern(str(id))
+        self.title = sys.intern(title)
+        self.wenyan = wenyan
+        self.zh = zh
+        self.en = en
+        self.num = num
+        self.content_hash = content_hash or text_hash(wenyan, zh, en)
+
+    @property
+    def z(self):
+        """模板中使用 'z' 表示现代汉语"""
+        return self.zh
+
+    def segments(self):
+        """按段落拆分，返回 [(文言文, 白话文, 英文), ...]"""
+        if not (self.wenyan or self.zh or self.en):
+            return []
+        return list(zip(self.wenyan.split('\n\n'), self.zh.split('\n\n'), self.en.split('\n\n')))
+
+    def __repr__(self):
+        return f'<Chapter {self.id} {self.title}>'
+
+
+class Category:
+    __slots__ = ('id', 'title', 'chapters', '_index')
+
+    def __init__(self, id, title, chapters):
+        self.id = sys.intern(id)
+        self.title = sys.intern(title)
+        self.chapters = chapters
+        self._index = {ch.id: i for i, ch in enumerate(chapters)}
+        for i, ch in enumerate(chapters, 1):
+            ch.num = i
+
+    def chapter_index(self, chapter_id):
+        """返回章节在分类中的位置，找不到时返回 None"""
+        return self._index.get(chapter_id)
+
+    def __repr__(self):
+        return f'<Category {self.id} ({len(self.chapters)} chapters)>'
+
+
+class Book:
+    __slots__ = ('id', 'title', 'categories', '_index')
+
+    def __init__(self, id, title, categories):
+        self.id = sys.intern(id)
+        self.title = sys.intern(title)
+        self.categories = categories
+        self._index = {cat.id: cat for cat in categories}
+
+    def category(self, category_id):
+        return self._index.get(category_id)
+
+    def __repr__(self):
+        return f'<Book {self.id} ({len(self.categories)} categories)>'
+
+
+def parse_three_parallel_file(file_path):
+    """
+    解析三平行格式的单个文件
+    格式: 文言文\n白话文\n英文\n\n文言文\n白话文\n英文...（空缺的一行写作 EMPTY_SEGMENT）
+    返回: {'wenyan': str, 'zh': str, 'en': str}
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+    except FileNotFoundError:
+        return {'wenyan': '', 'zh': '', 'en': ''}
+
+    if not content:
+        return {'wenyan': '', 'zh': '', 'en': ''}
+
+    # 按双换行分割段落组
+    paragraph_groups = content.split('\n\n')
+
+    wenyan_parts = []
+    zh_parts = []
+    en_parts = []
+
+    for group in paragraph_groups:
+        lines = [line.strip() for line in group.split('\n') if line.strip()]
+        lines = ['' if line == EMPTY_SEGMENT else line for line in lines]
+
+        if len(lines) >= 3:
+            # 标准三平行格式
+            wenyan_parts.append(lines[0])
+            zh_parts.append(lines[1])
+            en_parts.append(lines[2])
+        elif len(lines) == 2:
+            # 可能缺少英文
+            wenyan_parts.append(lines[0])
+            zh_parts.append(lines[1])
+            en_parts.append("")
+        elif len(lines) == 1:
+            # 只有一行，可能是标题或单独内容
+            wenyan_parts.append(lines[0])
+            zh_parts.append("")
+            en_parts.append("")
+
+    return {
+        'wenyan': '\n\n'.join(wenyan_parts),
+        'zh': '\n\n'.join(zh_parts),
+        'en': '\n\n'.join(en_parts)
+    }
+
+
+def chapter_title_from_filename(filename):
+    """从文件名提取章节标题，去掉 .txt 后缀和可能的序号前缀 (如 "01_标题" -> "标题")"""
+    chapter_title = filename[:-4]
+    if '_' in chapter_title:
+        chapter_title = chapter_title.split('_', 1)[1]
+    return chapter_title
+
+
+_PREFIX_RE = re.compile(r'^(\d+)_')
+_ORDINAL_RE = re.compile(r'第?([零〇一二三四五六七八九十百]+)$')
+_CN_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_VOLUMES = {'上': 1, '中': 2, '下': 3}
+
+
+def chinese_numeral(text):
+    """一百以内常见写法的中文数字转整数：十四、二十六、六十九、一百三十"""
+    total, current = 0, 0
+    for ch in text:
+        if ch == '百':
+            total += (current or 1) * 100
+            current = 0
+        elif ch == '十':
+            total += (current or 1) * 10
+            current = 0
+        else:
+            current = current * 10 + _CN_DIGITS[ch]
+    return total + current
+
+
+def chapter_id_from_filename(filename):
+    """稳定的章节 id：数字前缀（去掉前导零）或文件名（空白换成 "-"）"""
+    stem = filename[:-4].strip()
+    m = _PREFIX_RE.match(stem)
+    if m:
+        return str(int(m.group(1)))
+    return re.sub(r'\s+', '-', stem)
+
+
+def chapter_sort_key(filename):
+    """
+    章节排序：数字前缀或标题中的序数（"夏本纪第二"、"货殖列传六十九"）按数值排序，
+    "上 / 中 / 下" 分卷按卷序，其余按文件名；有序号的排在前面
+    """
+    stem = filename[:-4].strip()
+    m = _PREFIX_RE.match(stem)
+    if m:
+        return (0, int(m.group(1)), 0, stem)
+    base, volume = stem, 0
+    parts = stem.rsplit(None, 1)
+    if len(parts) == 2 and parts[1] in _VOLUMES:
+        base, volume = parts[0], _VOLUMES[parts[1]]
+    m = _ORDINAL_RE.search(base)
+    if m:
+        return (0, chinese_numeral(m.group(1)), volume, stem)
+    return (1, base, volume, stem)
+
+
+def list_chapter_files(cat_path):
+    """分类目录下的章节文件名，按 chapter_sort_key 排列"""
+    return sorted((f for f in os.listdir(cat_path) if f.endswith('.txt')), key=chapter_sort_key)
+
+
+def load_chapter(file_path, chapter_id=None):
+    """解析单个章节文件；chapter_id 默认由文件名得出"""
+    filename = os.path.basename(file_path)
+    content = parse_three_parallel_file(file_path)
+    if chapter_id is None:
+        chapter_id = chapter_id_from_filename(filename)
+    return Chapter(chapter_id, chapter_title_from_filename(filename),
+                   content['wenyan'], content['zh'], content['en'])
+
+
+def category_chapter_ids(cat_path):
+    """[(文件名, 章节 id), ...]；数字前缀重复时，后出现的章节改用完整文件名作 id"""
+    result, seen = [], set()
+    for filename in list_chapter_files(cat_path):
+        chapter_id = chapter_id_from_filename(filename)
+        if chapter_id in seen:
+            chapter_id = re.sub(r'\s+', '-', filename[:-4].strip())
+        seen.add(chapter_id)
+        result.append((filename, chapter_id))
+    return result
+
+
+def load_book(book_id, book_path):
+    """加载单本书: data/raw/<book>/<category>/<chapter>.txt，没有任何章节时返回 None"""
+    # 获取书籍配置
+    book_config = BOOK_CONFIGS.get(book_id, {"name": book_id, "categories": {}})
+    book_title = book_config["name"]
+
+    # 加载分类
+    categories = []
+    for cat_dir in sorted(os.listdir(book_path)):
+        cat_path = os.path.join(book_path, cat_dir)
+        if not os.path.isdir(cat_path):
+            continue
+
+        cat_title = book_config["categories"].get(cat_dir, cat_dir)
+
+        # 加载该分类下的章节
+        chapters = [load_chapter(os.path.join(cat_path, filename), chapter_id)
+                    for filename, chapter_id in category_chapter_ids(cat_path)]
+
+        if chapters:  # 只添加有章节的分类
+            categories.append(Category(cat_dir, cat_title, chapters))
+
+    if not categories:  # 只添加有内容的书籍
+        return None
+    return Book(book_id, book_title, categories)
+
+
+def iter_chapters(raw_dir, book_id=None, category_id=None):
+    """
+    逐个读取并解析章节文件，不在内存中保留整个语料
+    生成 (book_id, category_id, Chapter)，可按书籍 / 分类过滤
+    """
+    if not os.path.isdir(raw_dir):
+        return
+    for b_id in sorted(os.listdir(raw_dir)):
+        book_path = os.path.join(raw_dir, b_id)
+        if (book_id and b_id != book_id) or not os.path.isdir(book_path):
+            continue
+        for cat_dir in sorted(os.listdir(book_path)):
+            cat_path = os.path.join(book_path, cat_dir)
+            if (category_id and cat_dir != category_id) or not os.path.isdir(cat_path):
+                continue
+            for i, (filename, chapter_id) in enumerate(category_chapter_ids(cat_path), 1):
+                chapter = load_chapter(os.path.join(cat_path, filename), chapter_id)
+                chapter.num = i
+                yield b_id, cat_dir, chapter
+
+
+def iter_loaded_chapters(books, book_id=None, category_id=None):
+    """与 iter_chapters 相同的接口，数据来自已加载的 Book 列表"""
+    for book in books:
+        if book_id and book.id != book_id:
+            continue
+        for category in book.categories:
+            if category_id and category.id != category_id:
+                continue
+            for chapter in category.chapters:
+                yield book.id, category.id, chapter
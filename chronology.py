@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+纪年与人名地名索引：离线从对齐段落中抽取，按公历年份和名称查询
+
+- 纪年：文言文中的 "高祖十二年"、"元朔二年" 按 data/reigns.json 换算成公历年份（公元前为负数，没有公元 0 年）；
+  不带帝号的 "二年"、"明年" 沿用本章上文（或章节标题）中的纪年；只有 "五月丙寅" 等月份 / 干支日的段落归入上文年份；
+  白话文中括注的公历年份（公元前195年）优先于推算结果
+- 人名地名：按 data/gazetteer.json 中的别名匹配，繁体、异体字先折叠（normalize.fold_chinese）
+- 抽取结果按章节内容哈希缓存在 data/cache/chronology.json，语料或配置变化时只重新处理变化的章节
+
+干支日只用于把段落归入年份，不换算到具体日期（需要完整的历表）。
+
+用法:
+    python chronology.py                    # 更新缓存并打印概况
+    python chronology.py range -200 -190    # 公元前 200 年至前 190 年
+    python chronology.py entity 吕后
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+from bisect import bisect_left, bisect_right
+
+import content_cache
+from catalog import chinese_numeral
+from normalize import fold_chinese
+from storage import chapter_url
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REIGNS_PATH = os.path.join(BASE_DIR, 'data', 'reigns.json')
+GAZETTEER_PATH = os.path.join(BASE_DIR, 'data', 'gazetteer.json')
+CACHE_PATH = os.path.join(BASE_DIR, 'data', 'cache', 'chronology.json')
+CACHE_VERSION = 2  # 修改抽取规则后加一，使旧缓存失效
+
+SNIPPET_CHARS = 40
+# 本纪开头追述前朝（"高祖十一年，立为代王"）时，前朝纪年只沿用这么多段，之后回到章节默认纪年
+BACKSTORY_SEGMENTS = 3
+
+_NUM = r'(元|[一二三四五六七八九十]+)'
+# "居三年"、"后二年" 等表示时长或相对时间，不是纪年
+_NOT_YEAR_BEFORE = set('一二三四五六七八九十百元居凡积数余历后前经逾越')
+_NEXT_YEAR_RE = re.compile(r'(?:其)?明年')
+_GREGORIAN_RE = re.compile(r'公元(前)?(\d+)年')
+_STEMS = '甲乙丙丁戊己庚辛壬癸'
+_BRANCHES = '子丑寅卯辰巳午未申酉戌亥'
+_MONTH = r'闰?(?:正|十[一二]|[一二三四五六七八九十])月'
+_DAY_RE = re.compile(rf'(?:{_MONTH})?([{_STEMS}][{_BRANCHES}])|{_MONTH}')
+
+
+def load_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def reign_year(start, n):
+    """元年为 start 的第 n 年；跨过公元前 1 年时跳过不存在的 0 年"""
+    year = start + n - 1
+    if start < 0 <= year:
+        year += 1
+    return year
+
+
+def next_year(year):
+    return 1 if year == -1 else year + 1
+
+
+def format_year(year):
+    return f'公元前{-year}年' if year < 0 else f'公元{year}年'
+
+
+def _valid_ganzhi(text):
+    """天干地支奇偶一致才是六十甲子中的组合"""
+    return _STEMS.index(text[0]) % 2 == _BRANCHES.index(text[1]) % 2
+
+
+def _alternation(words):
+    return '|'.join(re.escape(w) for w in sorted(set(words), key=len, reverse=True))
+
+
+class Extractor:
+    def __init__(self, reigns=None, gazetteer=None):
+        self.reigns = (reigns if reigns is not None else load_json(REIGNS_PATH)).get('reigns', [])
+        gazetteer = gazetteer if gazetteer is not None else load_json(GAZETTEER_PATH)
+        self.entities = {}
+        for kind in ('persons', 'places'):
+            for name, entry in gazetteer.get(kind, {}).items():
+                self.entities[name] = (kind, [fold_chinese(a) for a in entry.get('aliases', [name])],
+                                       entry.get('books'))
+        self.config_hash = hashlib.sha1(json.dumps([self.reigns, gazetteer], sort_keys=True,
+                                                   ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+        self._per_book = {}
+
+    def _book_tables(self, book_id):
+        """每本书的 (纪年别名 -> 元年, 纪年正则, 名称别名 -> 规范名, 名称正则)"""
+        tables = self._per_book.get(book_id)
+        if tables is None:
+            eras = {}
+            for reign in self.reigns:
+                if reign.get('books') and book_id not in reign['books']:
+                    continue
+                for alias in [reign['name']] + reign.get('aliases', []):
+                    eras.setdefault(fold_chinese(alias), reign['start'])
+            names = {}
+            for name, (_, aliases, books) in self.entities.items():
+                if books and book_id not in books:
+                    continue
+                for alias in aliases:
+                    names.setdefault(alias, name)
+            era_re = re.compile(rf'({_alternation(eras)})?{_NUM}年' if eras else rf'(){_NUM}年')
+            name_re = re.compile(_alternation(names)) if names else None
+            tables = self._per_book[book_id] = (eras, era_re, names, name_re)
+        return tables
+
+    def chapter_era(self, book_id, title):
+        """由章节标题确定默认纪年（如 "纪-惠帝纪" -> 惠帝），找不到时返回 None"""
+        eras = self._book_tables(book_id)[0]
+        title = fold_chinese(title)
+        matches = [alias for alias in eras if len(alias) > 1 and alias in title]
+        return eras[max(matches, key=len)] if matches else None
+
+    def extract(self, book_id, chapter):
+        """
+        返回 {'dates': [[段落位置, 年份, 原文纪年, 摘录], ...], 'entities': {规范名: [段落位置, ...]}}
+        段落位置从 1 开始
+        """
+        eras, era_re, names, name_re = self._book_tables(book_id)
+        default_era = era_start = self.chapter_era(book_id, chapter.title)
+        backstory_until = 0
+        current = None
+        dates, entities = [], {}
+
+        for position, (w, z, _) in enumerate(chapter.segments(), 1):
+            text = fold_chinese(w)
+            if default_era is not None and era_start < default_era and position > backstory_until:
+                era_start = default_era
+            found = []  # [(年份, 原文)]
+            for m in era_re.finditer(text):
+                era, num = m.group(1), m.group(2)
+                if era:
+                    era_start = eras[era]
+                    if default_era is not None and era_start < default_era:
+                        backstory_until = position + BACKSTORY_SEGMENTS
+                elif era_start is None or (m.start() > 0 and text[m.start() - 1] in _NOT_YEAR_BEFORE):
+                    continue
+                n = 1 if num == '元' else chinese_numeral(num)
+                current = reign_year(era_start, n)
+                found.append((current, m.group(0)))
+            if current is not None:
+                for m in _NEXT_YEAR_RE.finditer(text):
+                    current = next_year(current)
+                    found.append((current, m.group(0)))
+
+            gregorian = [-int(n) if before else int(n) for before, n in _GREGORIAN_RE.findall(z)]
+            if gregorian:
+                # 白话文括注的公历年份优先
+                label = found[0][1] if found else ''
+                found = [(year, label or format_year(year)) for year in gregorian]
+                current = gregorian[-1]
+
+            day = None
+            for m in _DAY_RE.finditer(text):
+                if m.group(1) is None or _valid_ganzhi(m.group(1)):
+                    day = m.group(0)
+                    break
+            if not found and day and current is not None:
+                found.append((current, day))
+
+            seen = set()
+            for year, label in found:
+                if year in seen:
+                    continue
+                seen.add(year)
+                if day and day not in label:
+                    label += day
+                dates.append([position, year, label, w[:SNIPPET_CHARS]])
+
+            if name_re is not None:
+                for name in sorted({names[m.group(0)] for m in name_re.finditer(text + '\n' + fold_chinese(z))}):
+                    entities.setdefault(name, []).append(position)
+
+        return {'dates': dates, 'entities': entities}
+
+    def resolve(self, query):
+        """别名 -> 规范名（"呂后"、"高后" -> "吕后"），找不到时返回 None"""
+        folded = fold_chinese(query.strip())
+        if folded in self.entities:
+            return folded
+        for name, (_, aliases, _) in self.entities.items():
+            if folded in aliases:
+                return name
+        return None
+
+
+class Chronology:
+    """按年份排序的事件数组和名称倒排表，支持年份区间查询"""
+
+    def __init__(self, chapters, extractor):
+        """chapters: [(book_id, category_id, chapter_id, title, 抽取结果), ...]"""
+        self.extractor = extractor
+        self.chapters = [c[:4] for c in chapters]
+        events = []
+        self.mentions = {}
+        for ref, (_, _, _, _, data) in enumerate(chapters):
+            for position, year, label, snippet in data['dates']:
+                events.append((year, ref, position, label, snippet))
+            for name, positions in data['entities'].items():
+                self.mentions.setdefault(name, []).extend((ref, p) for p in positions)
+        events.sort(key=lambda e: e[:3])
+        self.events = events
+        self.years = [e[0] for e in events]
+
+    def _event(self, event):
+        year, ref, position, label, snippet = event
+        book_id, category_id, chapter_id, title = self.chapters[ref]
+        return {'year': year, 'year_label': format_year(year), 'label': label, 'snippet': snippet,
+                'book': book_id, 'category': category_id, 'chapter': chapter_id, 'title': title,
+                'segment': position, 'url': chapter_url(book_id, category_id, chapter_id, position)}
+
+    def range(self, start=None, end=None, book_id=None, entity=None):
+        """年份在 [start, end] 内的事件；entity 为规范名或别名时只保留提到它的段落"""
+        lo = 0 if start is None else bisect_left(self.years, start)
+        hi = len(self.years) if end is None else bisect_right(self.years, end)
+        wanted = None
+        if entity:
+            name = self.extractor.resolve(entity)
+            wanted = set(self.mentions.get(name, ()))
+        results = []
+        for event in self.events[lo:hi]:
+            if book_id and self.chapters[event[1]][0] != book_id:
+                continue
+            if wanted is not None and (event[1], event[2]) not in wanted:
+                continue
+            results.append(self._event(event))
+        return results
+
+    def entity(self, query, book_id=None):
+        """提到某人 / 某地的全部段落: [{'book', 'category', 'chapter', 'title', 'segment', 'url'}, ...]"""
+        name = self.extractor.resolve(query)
+        results = []
+        for ref, position in self.mentions.get(name, ()):
+            book_id_, category_id, chapter_id, title = self.chapters[ref]
+            if book_id and book_id_ != book_id:
+                continue
+            results.append({'book': book_id_, 'category': category_id, 'chapter': chapter_id, 'title': title,
+                            'segment': position, 'url': chapter_url(book_id_, category_id, chapter_id, position)})
+        return name, results
+
+    def entity_counts(self):
+        """[(规范名, 类别, 段落数), ...]，按段落数降序"""
+        counts = [(name, self.extractor.entities[name][0], len(refs)) for name, refs in self.mentions.items()]
+        return sorted(counts, key=lambda c: -c[2])
+
+    def to_json(self):
+        """静态站点导出的紧凑格式"""
+        return {
+            'chapters': self.chapters,
+            'events': [list(e) for e in self.events],
+            'mentions': {name: [list(m) for m in refs] for name, refs in self.mentions.items()},
+        }
+
+
+def build_chronology(books, cache_path=CACHE_PATH, fetch=None, extractor=None):
+    """
+    抽取全部章节并建立索引；缓存命中的章节不读取正文。
+    fetch(book, category, chapter) 用于补全只有标题的章节（见 storage.py）
+    """
+    extractor = extractor or Extractor()
+    cache = content_cache.load(cache_path, CACHE_VERSION, extractor.config_hash) if cache_path else {}
+    fresh = {}
+    computed = 0
+    chapters = []
+    for book in books:
+        for category in book.categories:
+            for chapter in category.chapters:
+                key = f'{book.id}:{chapter.content_hash}'
+                data = cache.get(key)
+                if data is None:
+                    full = fetch(book, category, chapter) if fetch is not None else chapter
+                    data = extractor.extract(book.id, full)
+                    computed += 1
+                fresh[key] = data
+                chapters.append((book.id, category.id, chapter.id, chapter.title, data))
+    if cache_path and (computed or len(fresh) != len(cache)):
+        content_cache.save(fresh, cache_path, CACHE_VERSION, extractor.config_hash)
+    chronology = Chronology(chapters, extractor)
+    chronology.computed = computed
+    return chronology
+
+
+def group_by_year(events):
+    """[(年份, 年份文字, [事件, ...]), ...]"""
+    groups = []
+    for event in events:
+        if not groups or groups[-1][0] != event['year']:
+            groups.append((event['year'], event['year_label'], []))
+        groups[-1][2].append(event)
+    return groups
+
+
+def main():
+    from build_static import load_books_from_raw
+
+    chronology = build_chronology(load_books_from_raw())
+    args = sys.argv[1:]
+    if len(args) >= 3 and args[0] == 'range':
+        for event in chronology.range(int(args[1]), int(args[2])):
+            print(f"{event['year_label']}  {event['title']} 第{event['segment']}段  {event['label']}  {event['snippet']}")
+        return
+    if len(args) >= 2 and args[0] == 'entity':
+        name, mentions = chronology.entity(args[1])
+        print(f'{name or args[1]}: {len(mentions)} 段')
+        for m in mentions:
+            print(f"  {m['title']} 第{m['segment']}段")
+        return
+    years = sorted(set(chronology.years))
+    span = f'{format_year(years[0])} — {format_year(years[-1])}' if years else '无'
+    print(f'纪年事件 {len(chronology.events)} 条，涉及 {len(years)} 个年份（{span}），'
+          f'本次新抽取 {chronology.computed} 章')
+    print('提及最多的人名地名:', '、'.join(f'{n}({c})' for n, _, c in chronology.entity_counts()[:15]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+按章节内容哈希缓存的计算结果（data/cache/ 下的 JSON 文件），corpus_stats.py 和 chronology.py 共用
+
+文件格式: {"version": 缓存版本, "config": 配置哈希, "chapters": {键: 结果}}
+版本或配置哈希与调用方不一致时视为没有缓存；修改计算规则后调用方把版本加一即可使旧缓存失效。
+"""
+import json
+import os
+
+
+def load(path, version, config=''):
+    """读取缓存，返回 {键: 结果}；文件不存在、损坏或版本 / 配置不符时返回空 dict"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if data.get('version') != version or data.get('config', '') != config:
+        return {}
+    return data.get('chapters', {})
+
+
+def save(entries, path, version, config=''):
+    """先写临时文件再原子替换；部署环境的数据目录可能只读，写失败时静默跳过"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': version, 'config': config, 'chapters': entries}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
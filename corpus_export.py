@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语料批量导出：把对齐的三平行段落流式导出为 JSONL、TMX 或 CSV
+
+- jsonl: 每行一个段落 {"book", "category", "chapter", "title", "segment", "wenyan", "zh", "en"}
+- tmx:   TMX 1.4 翻译记忆，每个段落一个 <tu>，语言为 lzh（文言文）/ zh / en
+- csv:   与 batch_import.import_from_csv 相同的格式，每行一个章节:
+         book,category,chapter_num,title,wenyan,zh,en（段落之间以空行分隔）
+
+全部由生成器按章节逐块产出，命令行模式逐个读取章节文件，整个语料不会同时驻留内存；
+--gzip 时直接输出 gzip 压缩流。
+
+用法:
+    python corpus_export.py jsonl [-o out.jsonl] [--book shiji] [--category benji] [--gzip]
+    python corpus_export.py tmx -o shiji.tmx --book shiji
+    python corpus_export.py csv -o corpus.csv.gz --gzip
+"""
+import csv
+import io
+import json
+import os
+import sys
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+
+from catalog import iter_chapters
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+
+CSV_HEADERS = ['book', 'category', 'chapter_num', 'title', 'wenyan', 'zh', 'en']
+
+TMX_LANGS = (('wenyan', 'lzh'), ('zh', 'zh'), ('en', 'en'))
+
+
+def export_jsonl(chapters):
+    for book_id, category_id, chapter in chapters:
+        lines = []
+        for i, (w, z, e) in enumerate(chapter.segments(), 1):
+            lines.append(json.dumps({
+                'book': book_id, 'category': category_id, 'chapter': chapter.id,
+                'title': chapter.title, 'segment': i, 'wenyan': w, 'zh': z, 'en': e,
+            }, ensure_ascii=False))
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+
+def export_tmx(chapters):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<tmx version="1.4">\n'
+           '  <header creationtool="sishi-corpus" creationtoolversion="1" segtype="sentence"'
+           ' o-tmf="txt" adminlang="en" srclang="lzh" datatype="plaintext"/>\n'
+           '  <body>\n')
+    for book_id, category_id, chapter in chapters:
+        parts = []
+        for i, segment in enumerate(chapter.segments(), 1):
+            tu_id = quoteattr(f'{book_id}/{category_id}/{chapter.id}/{i}')
+            parts.append(f'    <tu tuid={tu_id}>\n')
+            parts.append(f'      <prop type="x-title">{escape(chapter.title)}</prop>\n')
+            for text, (_, lang) in zip(segment, TMX_LANGS):
+                if text:
+                    parts.append(f'      <tuv xml:lang="{lang}"><seg>{escape(text)}</seg></tuv>\n')
+            parts.append('    </tu>\n')
+        if parts:
+            yield ''.join(parts)
+    yield '  </body>\n</tmx>\n'
+
+
+def export_csv(chapters):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_HEADERS)
+    for book_id, category_id, chapter in chapters:
+        # chapter_num 只用于生成文件名前缀，没有数字编号的章节（id 取自文件名）留空
+        writer.writerow([book_id, category_id, chapter.id if chapter.id.isdigit() else '', chapter.title,
+                         chapter.wenyan, chapter.zh, chapter.en])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+EXPORTERS = {
+    'jsonl': (export_jsonl, 'application/x-ndjson'),
+    'tmx': (export_tmx, 'application/x-tmx+xml'),
+    'csv': (export_csv, 'text/csv'),
+}
+
+
+def encode(chunks):
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
+
+
+def gzip_stream(chunks):
+    """把字节块流式压缩为 gzip 格式（wbits=31 生成 gzip 头尾）"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(fmt, chapters, compress=False):
+    """返回字节块生成器"""
+    exporter, _ = EXPORTERS[fmt]
+    stream = encode(exporter(chapters))
+    return gzip_stream(stream) if compress else stream
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] not in EXPORTERS:
+        print('语料导出工具使用方法:')
+        print('python corpus_export.py <jsonl|tmx|csv> [-o 输出文件] [--book 书籍] [--category 分类] [--gzip]')
+        return
+
+    fmt = args[0]
+    options = {'-o': None, '--book': None, '--category': None}
+    for flag in options:
+        if flag in args and args.index(flag) + 1 < len(args):
+            options[flag] = args[args.index(flag) + 1]
+    compress = '--gzip' in args
+
+    chapters = iter_chapters(RAW_DIR, options['--book'], options['--category'])
+    out = open(options['-o'], 'wb') if options['-o'] else sys.stdout.buffer
+    total = 0
+    try:
+        for chunk in export(fmt, chapters, compress):
+            out.write(chunk)
+            total += len(chunk)
+    finally:
+        if options['-o']:
+            out.close()
+    if options['-o']:
+        print(f'导出完成: {options["-o"]} ({total} 字节)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
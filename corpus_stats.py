@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+语料统计：按章节 / 分类 / 书籍汇总字数、段落数、文言文字频和翻译覆盖率
+
+- 每个章节的统计结果按内容哈希缓存在 data/cache/stats.json，
+  重新计算时只处理内容有变化的章节
+- 字频表基于 NumPy（把文本转成 Unicode 码位数组后 np.unique 计数）
+- 翻译覆盖率 = 白话文 / 英文非空的段落占全部段落的比例
+
+用法:
+    python corpus_stats.py              # 打印汇总
+    python corpus_stats.py json out.json
+"""
+import json
+import os
+import sys
+
+import numpy as np
+
+import content_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, 'data', 'cache', 'stats.json')
+CACHE_VERSION = 1
+
+# 汉字范围：基本区、扩展 A、兼容区、扩展 B 及以后
+HAN_RANGES = ((0x4E00, 0x9FFF), (0x3400, 0x4DBF), (0xF900, 0xFAFF), (0x20000, 0x3134F))
+
+TOP_CHARS = 30
+
+
+def chapter_hash(chapter):
+    """章节内容哈希，用作统计缓存的键（见 catalog.Chapter.content_hash）"""
+    return chapter.content_hash
+
+
+def _han_codes(text):
+    """文本中全部汉字的码位数组（NumPy）"""
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype='<u4')
+    mask = np.zeros(codes.shape, dtype=bool)
+    for lo, hi in HAN_RANGES:
+        mask |= (codes >= lo) & (codes <= hi)
+    return codes[mask]
+
+
+def han_count(text):
+    return int(_han_codes(text).size)
+
+
+def han_frequencies(text):
+    """返回 (码位列表, 次数列表)，按码位升序"""
+    uniq, counts = np.unique(_han_codes(text), return_counts=True)
+    return uniq.tolist(), counts.tolist()
+
+
+def merge_frequencies(tables):
+    """合并多个 (码位列表, 次数列表)"""
+    tables = [t for t in tables if t[0]]
+    if not tables:
+        return [], []
+    codes = np.concatenate([np.asarray(t[0], dtype=np.uint32) for t in tables])
+    counts = np.concatenate([np.asarray(t[1], dtype=np.int64) for t in tables])
+    uniq, inverse = np.unique(codes, return_inverse=True)
+    return uniq.tolist(), np.bincount(inverse, weights=counts).astype(np.int64).tolist()
+
+
+def top_characters(freq, n=TOP_CHARS):
+    """[(字, 次数), ...]，按次数降序"""
+    keys, counts = freq
+    if not keys:
+        return []
+    counts_arr = np.asarray(counts)
+    order = np.argsort(-counts_arr, kind='stable')[:n]
+    return [(chr(keys[i]), int(counts_arr[i])) for i in order]
+
+
+def compute_chapter_stats(chapter):
+    """计算单个章节的统计（不含标题等元信息，可直接缓存）"""
+    segments = chapter.segments()
+    wenyan_freq = han_frequencies(chapter.wenyan)
+    return {
+        'segments': len(segments),
+        'wenyan_chars': sum(wenyan_freq[1]),
+        'zh_chars': han_count(chapter.zh),
+        'en_words': len(chapter.en.split()),
+        'empty_zh': sum(1 for _, z, _ in segments if not z),
+        'empty_en': sum(1 for _, _, e in segments if not e),
+        'freq': wenyan_freq,
+    }
+
+
+SUM_FIELDS = ('segments', 'wenyan_chars', 'zh_chars', 'en_words', 'empty_zh', 'empty_en')
+
+
+def _summarise(id, title, children, child_key):
+    """汇总子节点统计；children 为已算好的统计 dict 列表"""
+    node = {'id': id, 'title': title}
+    for field in SUM_FIELDS:
+        node[field] = sum(c[field] for c in children)
+    node['chapters'] = sum(c.get('chapters', 1) for c in children)
+    node['freq'] = merge_frequencies([c['freq'] for c in children])
+    node[child_key] = children
+    return node
+
+
+def _finish(node):
+    """补充覆盖率、高频字，并去掉不需要输出的完整字频表"""
+    segments = node['segments']
+    node['zh_coverage'] = round(1 - node['empty_zh'] / segments, 4) if segments else 0.0
+    node['en_coverage'] = round(1 - node['empty_en'] / segments, 4) if segments else 0.0
+    node['top_chars'] = top_characters(node.pop('freq'))
+    for key in ('categories', 'chapter_list'):
+        for child in node.get(key, []):
+            _finish(child)
+    return node
+
+
+def build_stats(books, cache_path=CACHE_PATH, fetch=None):
+    """
+    计算全部统计；fetch(book, category, chapter) 用于补全只有标题的章节（见 storage.py），返回:
+    {'totals': {...}, 'books': [{..., 'categories': [{..., 'chapter_list': [...]}]}],
+     'computed': 本次新计算的章节数, 'cached': 复用缓存的章节数}
+    """
+    cache = content_cache.load(cache_path, CACHE_VERSION) if cache_path else {}
+    fresh = {}
+    computed = 0
+
+    book_nodes = []
+    for book in books:
+        category_nodes = []
+        for category in book.categories:
+            chapter_nodes = []
+            for chapter in category.chapters:
+                if fetch is not None:
+                    chapter = fetch(book, category, chapter)
+                key = chapter_hash(chapter)
+                stats = cache.get(key)
+                if stats is None:
+                    stats = compute_chapter_stats(chapter)
+                    computed += 1
+                fresh[key] = stats
+                node = dict(stats, id=chapter.id, title=chapter.title)
+                node['freq'] = tuple(stats['freq'])
+                chapter_nodes.append(node)
+            category_nodes.append(_summarise(category.id, category.title, chapter_nodes, 'chapter_list'))
+        book_nodes.append(_summarise(book.id, book.title, category_nodes, 'categories'))
+
+    totals = _summarise('all', '全部', book_nodes, 'books')
+    books_out = totals.pop('books')
+    _finish(totals)
+    for node in books_out:
+        _finish(node)
+
+    # 只保留当前语料对应的条目，已删除或修改前的章节随之淘汰
+    if cache_path and (computed or len(fresh) != len(cache)):
+        content_cache.save(fresh, cache_path, CACHE_VERSION)
+
+    return {'totals': totals, 'books': books_out, 'computed': computed, 'cached': len(fresh) - computed}
+
+
+def missing_translations(stats):
+    """列出缺少白话文或英文段落的章节: [(书, 分类, 章节, 缺白话文段数, 缺英文段数), ...]"""
+    rows = []
+    for book in stats['books']:
+        for category in book['categories']:
+            for chapter in category['chapter_list']:
+                if chapter['empty_zh'] or chapter['empty_en']:
+                    rows.append((book['title'], category['title'], chapter['title'],
+                                 chapter['empty_zh'], chapter['empty_en']))
+    return rows
+
+
+def main():
+    from build_static import load_books_from_raw
+
+    stats = build_stats(load_books_from_raw())
+    if len(sys.argv) >= 3 and sys.argv[1] == 'json':
+        with open(sys.argv[2], 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False)
+        print(f'统计已写入: {sys.argv[2]}')
+        return
+
+    totals = stats['totals']
+    print(f"共 {totals['chapters']} 章, {totals['segments']} 段, 文言文 {totals['wenyan_chars']} 字 "
+          f"(新计算 {stats['computed']} 章, 缓存 {stats['cached']} 章)")
+    for book in stats['books']:
+        top = ''.join(ch for ch, _ in book['top_chars'][:10])
+        print(f"  {book['title']}: {book['chapters']} 章, 文言文 {book['wenyan_chars']} 字, "
+              f"英文覆盖率 {book['en_coverage']:.1%}, 高频字 {top}")
+    gaps = missing_translations(stats)
+    if gaps:
+        print('缺少翻译的章节:')
+        for book_title, category_title, chapter_title, empty_zh, empty_en in gaps:
+            print(f'  {book_title}/{category_title}/{chapter_title}: 缺白话文 {empty_zh} 段, 缺英文 {empty_en} 段')
+
+
+if __name__ == '__main__':
+    main()
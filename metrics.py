@@ -0,0 +1,209 @@
+"""
+请求级性能埋点：Server-Timing 响应头 + Prometheus 文本格式的 /metrics 端点
+
+用法（app.py 中）:
+    import metrics
+    metrics.init_app(app)
+
+    with metrics.stage('lookup'):
+        ...
+
+环境变量 METRICS_ENABLED=0 可整体关闭（不注册钩子，也不暴露 /metrics），
+stage() 此时退化为空的上下文管理器，几乎没有开销。
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+ENABLED = os.environ.get('METRICS_ENABLED', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+# 单位：秒。页面渲染一般在毫秒级，桶集中在 1ms~1s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    """单调递增计数器，按标签值分组"""
+
+    kind = 'counter'
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def get(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            yield self.name, _format_labels(self.labelnames, labelvalues), value
+
+
+class Gauge(Counter):
+    """可任意设置的瞬时值"""
+
+    kind = 'gauge'
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram:
+    """累积分桶直方图（Prometheus 语义：le 为上界，包含 +Inf）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labelvalues -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        names = self.labelnames + ('le',)
+        for labelvalues, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield self.name + '_bucket', _format_labels(names, labelvalues + (repr(bound),)), cumulative
+            yield self.name + '_bucket', _format_labels(names, labelvalues + ('+Inf',)), state[-1]
+            yield self.name + '_sum', _format_labels(self.labelnames, labelvalues), state[-2]
+            yield self.name + '_count', _format_labels(self.labelnames, labelvalues), state[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.doc}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'corpus_request_duration_seconds', '请求总耗时', ('route',)))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    'corpus_stage_duration_seconds', '请求内各阶段耗时', ('route', 'stage')))
+REQUESTS = REGISTRY.register(Counter(
+    'corpus_requests_total', '请求数', ('route', 'status')))
+RESPONSE_BYTES = REGISTRY.register(Counter(
+    'corpus_response_bytes_total', '响应体字节数', ('route',)))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'corpus_cache_requests_total', '缓存查询次数', ('cache', 'result')))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    'corpus_cache_hit_ratio', '缓存命中率（启动以来累计）', ('cache',)))
+CORPUS_LOAD_SECONDS = REGISTRY.register(Gauge(
+    'corpus_load_duration_seconds', '语料加载耗时（启动时或最近一次重载）'))
+
+
+@contextmanager
+def stage(name):
+    """记录当前请求中一个阶段的耗时；关闭埋点或不在请求上下文中时什么都不做"""
+    if not ENABLED or not has_request_context():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = g.setdefault('_stage_timings', [])
+        timings.append((name, time.perf_counter() - start))
+
+
+def record_cache(cache, hit):
+    """记录一次缓存查询结果，并刷新该缓存的命中率"""
+    if not ENABLED:
+        return
+    CACHE_REQUESTS.inc(cache, 'hit' if hit else 'miss')
+    hits = CACHE_REQUESTS.get(cache, 'hit')
+    total = hits + CACHE_REQUESTS.get(cache, 'miss')
+    CACHE_HIT_RATIO.set(hits / total, cache)
+
+
+def _before_request():
+    g._request_start = time.perf_counter()
+
+
+def _after_request(response):
+    start = g.pop('_request_start', None)
+    if start is None:
+        return response
+    total = time.perf_counter() - start
+    route = request.endpoint or 'unmatched'
+    timings = g.pop('_stage_timings', [])
+
+    entries = [f'{name};dur={duration * 1000:.2f}' for name, duration in timings]
+    entries.append(f'total;dur={total * 1000:.2f}')
+    response.headers['Server-Timing'] = ', '.join(entries)
+
+    if route != 'metrics':
+        REQUEST_LATENCY.observe(total, route)
+        for name, duration in timings:
+            STAGE_LATENCY.observe(duration, route, name)
+        REQUESTS.inc(route, str(response.status_code))
+        # 流式响应没有确定长度，不计入字节数
+        if not response.is_streamed:
+            RESPONSE_BYTES.inc(route, amount=response.calculate_content_length() or 0)
+    return response
+
+
+def metrics_view():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """在 Flask 应用上注册计时钩子和 /metrics 路由"""
+    if not ENABLED:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
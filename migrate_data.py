@@ -9,6 +9,8 @@ import shutil
 import re
 from pathlib import Path
 
+import aligner
+
 # 当前和目标目录
 CURRENT_RAW_DIR = "data/raw"
 NEW_RAW_DIR = "data/raw_new"
@@ -245,32 +247,9 @@ def migrate_book(book_path, book_id):
 def create_parallel_content(wenyan, zh, en):
     """
     创建三平行格式的内容
-    将三种语言的内容重新组织为段落对应的格式
+    三种文本按段落长度对齐后重新组合（见 aligner.py）
     """
-    # 简单处理：按段落分割并重新组合
-    w_paragraphs = [p.strip() for p in wenyan.split('\n\n') if p.strip()]
-    z_paragraphs = [p.strip() for p in zh.split('\n\n') if p.strip()]
-    e_paragraphs = [p.strip() for p in en.split('\n\n') if p.strip()]
-    
-    # 对齐段落数量
-    max_paras = max(len(w_paragraphs), len(z_paragraphs), len(e_paragraphs))
-    
-    parallel_groups = []
-    for i in range(max_paras):
-        w = w_paragraphs[i] if i < len(w_paragraphs) else ""
-        z = z_paragraphs[i] if i < len(z_paragraphs) else ""
-        e = e_paragraphs[i] if i < len(e_paragraphs) else ""
-        
-        # 组成三平行段落组
-        group = []
-        if w: group.append(w)
-        if z: group.append(z) 
-        if e: group.append(e)
-        
-        if group:
-            parallel_groups.append('\n'.join(group))
-    
-    return '\n\n'.join(parallel_groups)
+    return aligner.to_three_parallel(aligner.align_texts(wenyan, zh, en))
 
 def main():
     """主函数"""
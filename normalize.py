@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检索用的文本归一化（折叠）
+
+- 汉字：繁体字、异体字折叠为规范简体字，对照表见 data/variants.tsv
+- 英文：转小写并去掉变音符号；语料英文以汉语拼音为主（Xiang Yu、Chu），也有威妥玛（Kao-tsu、Ch'u），
+  首字母大写的词无法确定是哪一种，因此英文折叠为两段检索词：原词（xiang yu chu）和
+  按威妥玛转换后的拼音（xiang you zhu），两段之间以 STREAM_SEPARATOR 隔开，短语不会跨段匹配；
+  连字符人名在拼音段同时生成逐音节和连写两种形式（xiao hui xiaohui）
+- 查询：只有带威妥玛特征（撇号、ü、hs / ts / tz 开头）的词才转换，其余按原词在两段中匹配，
+  小写拼音输入（xiang yu、chu）与语料原文一致
+
+语料在建索引时折叠一次（search_index.py、storage.ingest），查询只需调用 normalize_query 一次。
+
+用法:
+    python normalize.py "Kao-tsu 漢書"      # 查看折叠结果
+"""
+import os
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VARIANTS_PATH = os.path.join(BASE_DIR, 'data', 'variants.tsv')
+
+# 汉语拼音全部音节（不含声调；ü 记作 v）
+PINYIN_SYLLABLES = frozenset("""
+a ai an ang ao ba bai ban bang bao bei ben beng bi bian biao bie bin bing bo bu
+ca cai can cang cao ce cen ceng cha chai chan chang chao che chen cheng chi chong chou
+chu chua chuai chuan chuang chui chun chuo ci cong cou cu cuan cui cun cuo
+da dai dan dang dao de dei den deng di dia dian diao die ding diu dong dou du duan dui dun duo
+e ei en eng er fa fan fang fei fen feng fo fou fu
+ga gai gan gang gao ge gei gen geng gong gou gu gua guai guan guang gui gun guo
+ha hai han hang hao he hei hen heng hong hou hu hua huai huan huang hui hun huo
+ji jia jian jiang jiao jie jin jing jiong jiu ju juan jue jun
+ka kai kan kang kao ke kei ken keng kong kou ku kua kuai kuan kuang kui kun kuo
+la lai lan lang lao le lei leng li lia lian liang liao lie lin ling liu long lou lu luan lun luo lv lve
+ma mai man mang mao me mei men meng mi mian miao mie min ming miu mo mou mu
+na nai nan nang nao ne nei nen neng ni nian niang niao nie nin ning niu nong nou nu nuan nuo nv nve
+o ou pa pai pan pang pao pei pen peng pi pian piao pie pin ping po pou pu
+qi qia qian qiang qiao qie qin qing qiong qiu qu quan que qun
+ran rang rao re ren reng ri rong rou ru rua ruan rui run ruo
+sa sai san sang sao se sen seng sha shai shan shang shao she shei shen sheng shi shou
+shu shua shuai shuan shuang shui shun shuo si song sou su suan sui sun suo
+ta tai tan tang tao te teng ti tian tiao tie ting tong tou tu tuan tui tun tuo
+wa wai wan wang wei wen weng wo wu xi xia xian xiang xiao xie xin xing xiong xiu xu xuan xue xun
+ya yan yang yao ye yi yin ying yo yong you yu yuan yue yun
+za zai zan zang zao ze zei zen zeng zha zhai zhan zhang zhao zhe zhei zhen zheng zhi zhong zhou
+zhu zhua zhuai zhuan zhuang zhui zhun zhuo zi zong zou zu zuan zui zun zuo
+""".split())
+
+# 整体转换的威妥玛音节
+WG_SPECIAL = {
+    'erh': 'er', 'o': 'e', 'i': 'yi', 'yu': 'you', 'yü': 'yu', 'yung': 'yong',
+    'yen': 'yan', 'yeh': 'ye', 'yüeh': 'yue', 'yüan': 'yuan', 'yün': 'yun',
+    'szu': 'si', 'ssu': 'si', 'tzu': 'zi', "tz'u": 'ci', 'shih': 'shi',
+    'chih': 'zhi', "ch'ih": 'chi', 'jih': 'ri', 'hsü': 'xu',
+}
+
+# 声母，按长度优先匹配；ch / ch' 需看后面的韵母（i、ü 前为 j / q）
+WG_INITIALS = (
+    ("ch'", None), ('ch', None), ("ts'", 'c'), ("tz'", 'c'), ('ts', 'z'), ('tz', 'z'),
+    ('hs', 'x'), ('sh', 'sh'), ("k'", 'k'), ('k', 'g'), ("p'", 'p'), ('p', 'b'),
+    ("t'", 't'), ('t', 'd'), ('j', 'r'),
+)
+
+# 韵母改写，按长度优先
+WG_FINALS = (
+    ('üeh', 'üe'), ('ueh', 'ue'), ('iung', 'iong'), ('ieh', 'ie'), ('ien', 'ian'),
+    ('ung', 'ong'), ('uei', 'ui'), ('ih', 'i'),
+)
+
+# 单独出现时按英文处理的词（与威妥玛音节同形）
+ENGLISH_WORDS = frozenset('a an he i o to so no men ten man hen pen lo ha ma pa'.split())
+
+# 原词段与拼音段之间的分隔词：检索词只含字母，数字不会出现在查询短语中
+STREAM_SEPARATOR = '0'
+
+_APOSTROPHES = str.maketrans({'’': "'", '‘': "'", 'ʻ': "'", 'ʼ': "'", '`': "'"})
+_LATIN_TOKEN_RE = re.compile(r"[A-Za-zÀ-ɏ]+(?:['’‘ʻʼ`][A-Za-zÀ-ɏ]+)*(?:-[A-Za-zÀ-ɏ]+(?:['’‘ʻʼ`][A-Za-zÀ-ɏ]+)*)*")
+
+_variant_table = None
+
+
+def load_variants(path=VARIANTS_PATH):
+    """读取异体字对照表，返回 str.translate 用的映射"""
+    mapping = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) >= 2 and len(parts[0]) == 1 and parts[1]:
+                    mapping[ord(parts[0])] = parts[1]
+    except FileNotFoundError:
+        pass
+    return mapping
+
+
+def fold_chinese(text):
+    """繁体 / 异体字折叠为规范字"""
+    global _variant_table
+    if _variant_table is None:
+        _variant_table = load_variants()
+    return text.translate(_variant_table)
+
+
+def strip_diacritics(text):
+    """去掉变音符号，保留 ü（威妥玛中 ü 与 u 是不同韵母）"""
+    text = text.replace('ü', '\0').replace('Ü', '\1')
+    text = ''.join(c for c in unicodedata.normalize('NFD', text) if not unicodedata.combining(c))
+    return text.replace('\0', 'ü').replace('\1', 'Ü')
+
+
+def wade_giles_syllable(syllable):
+    """单个威妥玛音节转汉语拼音（小写，ü 折叠为 u），不是合法音节时返回 None"""
+    s = strip_diacritics(syllable.lower().translate(_APOSTROPHES)).replace('ŭ', 'u').replace('ê', 'e')
+    if s in WG_SPECIAL:
+        return WG_SPECIAL[s]
+
+    initial, rest = '', s
+    for wg, py in WG_INITIALS:
+        if s.startswith(wg):
+            rest = s[len(wg):]
+            if py is None:
+                palatal = rest[:1] in ('i', 'ü')
+                py = ('q' if palatal else 'ch') if wg.endswith("'") else ('j' if palatal else 'zh')
+            initial = py
+            break
+    else:
+        if s[:1] and s[0] not in 'aeiouü':
+            initial, rest = s[0], s[1:]
+    if "'" in rest:
+        return None
+
+    for wg, py in WG_FINALS:
+        if rest.endswith(wg):
+            rest = rest[:-len(wg)] + py
+            break
+    if rest == 'o' and initial in ('d', 't', 'n', 'l', 'z', 'c', 's', 'r', 'zh', 'ch', 'sh'):
+        rest = 'uo'
+    elif rest == 'o' and initial in ('g', 'k', 'h'):
+        rest = 'e'
+    if 'ü' in rest:
+        rest = rest.replace('ü', 'u' if initial in ('x', 'q', 'j', 'y') else 'v')
+
+    pinyin = initial + rest
+    if pinyin not in PINYIN_SYLLABLES:
+        return None
+    return pinyin.replace('v', 'u')
+
+
+def wade_giles_word(word):
+    """
+    连字符或单个威妥玛词转拼音音节列表，如 Hsiao-hui -> ['xiao', 'hui']；
+    任一音节不合法时返回 None
+    """
+    syllables = []
+    for part in word.split('-'):
+        py = wade_giles_syllable(part)
+        if py is None:
+            return None
+        syllables.append(py)
+    return syllables
+
+
+def _has_wade_giles_marker(token):
+    """撇号、ü（ŭ、ê）或 hs / ts / tz 开头的音节：只在威妥玛中出现，汉语拼音中没有"""
+    lower = token.lower().translate(_APOSTROPHES)
+    if "'" in lower or any(c in lower for c in 'üŭê'):
+        return True
+    return any(part.startswith(('hs', 'ts', 'tz')) for part in lower.split('-'))
+
+
+def _looks_wade_giles(token, query):
+    """
+    语料中首字母大写或带连字符的词都可能是威妥玛，转换结果写入拼音段；
+    查询中的词要有威妥玛特征，或者同一查询中有带特征的词（Hsiang Yu 整体按威妥玛处理）
+    """
+    if token.lower() in ENGLISH_WORDS:
+        return False
+    if _has_wade_giles_marker(token):
+        return True
+    return (token[:1].isupper() or '-' in token) and (not query or query == 'wade-giles')
+
+
+def _plain_words(token):
+    plain = strip_diacritics(token.translate(_APOSTROPHES)).lower().replace('ü', 'u')
+    return [w for w in re.split(r"['\-]", plain) if w]
+
+
+@lru_cache(maxsize=65536)
+def _literal_token(token):
+    """语料中单个词的原词形式"""
+    return ' '.join(_plain_words(token))
+
+
+@lru_cache(maxsize=65536)
+def _fold_token(token):
+    """语料中单个词的拼音段形式；语料词汇量远小于词数，按词缓存"""
+    syllables = wade_giles_word(token) if _looks_wade_giles(token, False) else None
+    if syllables is None:
+        return _literal_token(token)
+    if len(syllables) > 1:
+        syllables.append(''.join(syllables))
+    return ' '.join(syllables)
+
+
+def fold_english(text):
+    """
+    英文文本折叠为检索词序列（空格分隔）：原词段，若威妥玛转换改变了其中的词，
+    再接 STREAM_SEPARATOR 和拼音段（威妥玛人名地名转为拼音，多音节名字追加连写形式）
+    """
+    tokens = _LATIN_TOKEN_RE.findall(text)
+    literal = ' '.join(filter(None, map(_literal_token, tokens)))
+    converted = ' '.join(filter(None, map(_fold_token, tokens)))
+    if converted == literal:
+        return literal
+    return f'{literal} {STREAM_SEPARATOR} {converted}'
+
+
+def normalize_query(query):
+    """
+    查询归一化，返回 (汉字检索串列表, 拉丁字母检索词列表)
+    汉字串按空白和拉丁字母切开，各自折叠为规范字。
+    拉丁字母词按原词匹配（原词段和拼音段都可命中）；查询带威妥玛特征时按威妥玛转换，
+    多音节名字（Kao-tsu）取连写形式 gaozu，与拼音段中的连写形式匹配
+    """
+    chinese = [fold_chinese(part) for part in re.findall(r'[^\W\d_A-Za-zÀ-ɏ]+', query)]
+    tokens = _LATIN_TOKEN_RE.findall(query)
+    mode = 'wade-giles' if any(map(_has_wade_giles_marker, tokens)) else 'literal'
+    latin = []
+    for token in tokens:
+        syllables = wade_giles_word(token) if _looks_wade_giles(token, mode) else None
+        if syllables is None:
+            latin.extend(_plain_words(token))
+        else:
+            latin.append(''.join(syllables))
+    return chinese, latin
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('文本归一化工具使用方法:')
+        print('python normalize.py "查询文本"')
+        return
+    text = ' '.join(sys.argv[1:])
+    chinese, latin = normalize_query(text)
+    print(f'汉字: {" ".join(chinese)}')
+    print(f'拉丁: {" ".join(latin)}')
+    print(f'英文折叠: {fold_english(text)}')
+
+
+if __name__ == '__main__':
+    main()
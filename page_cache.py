@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+已渲染页面的内存缓存（首页、书籍页、分类页；章节页使用一个限定容量的实例）
+
+这些页面只取决于目录结构（书籍 / 分类 / 章节的 id、标题和内容哈希），
+缓存以目录的数据版本为键：版本不变时直接返回缓存的 HTML 及其 gzip 压缩结果，
+目录变化（set_version 收到新版本）时整体失效并按需重新渲染。
+同一页面的原文和 gzip 结果是不同的表示，强 ETag 必须不同：gzip 结果的 ETag 加 GZIP_ETAG_SUFFIX。
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+GZIP_LEVEL = 6
+GZIP_ETAG_SUFFIX = '-gz'
+
+
+def data_version(books):
+    """目录的数据版本：书籍、分类、章节的 id / 标题及章节内容哈希"""
+    h = hashlib.sha1()
+    for book in books:
+        h.update(f'{book.id}\0{book.title}\1'.encode('utf-8'))
+        for category in book.categories:
+            h.update(f'{category.id}\0{category.title}\1'.encode('utf-8'))
+            for chapter in category.chapters:
+                h.update(f'{chapter.id}\0{chapter.title}\0{chapter.content_hash}\1'.encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def coded_etag(etag, gzipped):
+    """按内容编码区分的 ETag"""
+    return etag + GZIP_ETAG_SUFFIX if gzipped else etag
+
+
+class CachedPage:
+    __slots__ = ('body', 'gzip_body', 'etag')
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.gzip_body = gzip.compress(body, GZIP_LEVEL, mtime=0)
+        self.etag = etag
+
+
+class PageCache:
+    def __init__(self, version='', max_entries=None):
+        """max_entries 不为 None 时按最近最少使用淘汰，超出容量的页面被丢弃"""
+        self.version = version
+        self.max_entries = max_entries
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_version(self, version):
+        """数据版本变化时清空缓存"""
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._pages = OrderedDict()
+
+    def get(self, key):
+        if self.max_entries is None:
+            return self._pages.get(key)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def __contains__(self, key):
+        return key in self._pages
+
+    def get_or_render(self, key, render, etag=None):
+        """
+        返回 (CachedPage, 是否命中)；render() 返回 HTML 字符串，etag 未给出时按内容计算。
+        并发未命中时可能重复渲染，结果相同，后写入的覆盖先写入的
+        """
+        page = self.get(key)
+        if page is not None:
+            return page, True
+        version = self.version
+        body = render().encode('utf-8')
+        if etag is None:
+            etag = hashlib.sha1(f'{version}\0{key}'.encode('utf-8') + body).hexdigest()[:20]
+        page = CachedPage(body, etag)
+        with self._lock:
+            if version == self.version:
+                self._pages[key] = page
+                if self.max_entries is not None and len(self._pages) > self.max_entries:
+                    self._pages.popitem(last=False)
+        return page, False
+
+    def __len__(self):
+        return len(self._pages)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态站点增量发布
+
+build_static.py 每次从头生成 out/，并写出发布清单 out/manifest.json：
+    {"version": 1, "files": {"index.html": {"sha1": "...", "size": 1386}, ...}}
+与上次发布的清单比较即可得出新增 / 修改 / 删除的文件，部署时只需上传这些文件、
+只让 CDN 刷新这些路径。
+
+用法:
+    python publish.py <目标目录>              # 把 out/ 的变化同步到目标目录（代替真实的托管服务）
+    python publish.py <目标目录> --dry-run    # 只列出变化
+    python publish.py --diff old.json new.json
+
+目标目录中的 manifest.json 记录其当前内容，同步完成后最后写入；
+目标目录没有清单时视为空站点，全部文件都作为新增上传。
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUT_DIR = os.path.join(BASE_DIR, 'out')
+MANIFEST_NAME = 'manifest.json'
+DELTA_NAME = 'delta.json'
+MANIFEST_VERSION = 1
+
+# 清单自身和差异文件不计入清单
+_SKIP = {MANIFEST_NAME, DELTA_NAME}
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def build_manifest(out_dir=OUT_DIR):
+    """遍历输出目录，返回 {'version', 'files': {相对路径: {'sha1', 'size'}}}，路径用 / 分隔"""
+    files = {}
+    for root, dirs, names in os.walk(out_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, out_dir).replace(os.sep, '/')
+            if rel in _SKIP:
+                continue
+            files[rel] = {'sha1': file_sha1(path), 'size': os.path.getsize(path)}
+    return {'version': MANIFEST_VERSION, 'files': files}
+
+
+def load_manifest(path):
+    """读取清单；path 可以是清单文件或包含 manifest.json 的目录，不存在时返回空清单"""
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {'version': MANIFEST_VERSION, 'files': {}}
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f'不支持的清单版本: {manifest.get("version")}（{path}）')
+    return manifest
+
+
+def write_manifest(manifest, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+def diff_manifests(old, new):
+    """返回 {'added', 'changed', 'removed': [路径, ...], 'upload_bytes': 需上传的字节数}"""
+    old_files, new_files = old['files'], new['files']
+    added = sorted(p for p in new_files if p not in old_files)
+    changed = sorted(p for p in new_files if p in old_files and new_files[p]['sha1'] != old_files[p]['sha1'])
+    removed = sorted(p for p in old_files if p not in new_files)
+    upload = sum(new_files[p]['size'] for p in added + changed)
+    return {'added': added, 'changed': changed, 'removed': removed, 'upload_bytes': upload}
+
+
+def summarize(delta, total=None):
+    text = (f"新增 {len(delta['added'])}，修改 {len(delta['changed'])}，删除 {len(delta['removed'])}，"
+            f"上传 {delta['upload_bytes']} 字节")
+    if total is not None:
+        text += f'（共 {total} 个文件）'
+    return text
+
+
+def sync(out_dir, target_dir, delta, manifest):
+    """把 delta 中的文件从 out_dir 复制到 target_dir、删除已移除的文件，最后写入新清单"""
+    for rel in delta['added'] + delta['changed']:
+        src = os.path.join(out_dir, *rel.split('/'))
+        dst = os.path.join(target_dir, *rel.split('/'))
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = dst + '.tmp'
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    for rel in delta['removed']:
+        path = os.path.join(target_dir, *rel.split('/'))
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        # 清理删空的目录
+        parent = os.path.dirname(path)
+        while parent != os.path.abspath(target_dir) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+    write_manifest(manifest, os.path.join(target_dir, MANIFEST_NAME))
+
+
+def print_delta(delta):
+    for label, key in (('+', 'added'), ('~', 'changed'), ('-', 'removed')):
+        for rel in delta[key]:
+            print(f'  {label} {rel}')
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print('增量发布工具使用方法:')
+        print('python publish.py <目标目录> [--dry-run]')
+        print('python publish.py --diff 旧清单.json 新清单.json')
+        return
+
+    if args[0] == '--diff':
+        delta = diff_manifests(load_manifest(args[1]), load_manifest(args[2]))
+        print_delta(delta)
+        print(summarize(delta))
+        return
+
+    target = os.path.abspath(args[0])
+    dry_run = '--dry-run' in args
+    manifest = load_manifest(os.path.join(OUT_DIR, MANIFEST_NAME))
+    if not manifest['files']:
+        print('out/manifest.json 不存在，请先运行 python build_static.py')
+        sys.exit(1)
+    delta = diff_manifests(load_manifest(target), manifest)
+    print_delta(delta)
+    if not dry_run:
+        os.makedirs(target, exist_ok=True)
+        sync(OUT_DIR, target, delta, manifest)
+    print(('（预览）' if dry_run else '已同步: ') + summarize(delta, len(manifest['files'])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+旧章节 URL 的重定向表
+
+章节 id 原来是分类目录中按文件名字典序排列的位置（1, 2, 3...），现在由文件名决定（见 catalog.py）。
+data/redirects.json 记录已发布的旧位置 -> 新 id：
+    {"shiji": {"benji": {"1": "本纪-五帝本纪一", ...}}, ...}
+app.py 对旧 URL 返回 301，build_static.py 在旧路径生成跳转页。
+
+旧位置只对生成时的目录有意义，因此重新生成时已有条目保持不变，只为新出现的分类补充条目。
+
+用法:
+    python redirects.py          # 生成 / 补充 data/redirects.json
+"""
+import json
+import os
+import sys
+
+from catalog import category_chapter_ids
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+REDIRECTS_PATH = os.path.join(BASE_DIR, 'data', 'redirects.json')
+
+
+def legacy_redirects(cat_path):
+    """按旧规则（文件名字典序，从 1 编号）计算 {旧位置: 新 id}，只保留两者不同的条目"""
+    new_ids = dict(category_chapter_ids(cat_path))
+    legacy = sorted(new_ids)
+    return {str(i): new_ids[filename] for i, filename in enumerate(legacy, 1)
+            if new_ids[filename] != str(i)}
+
+
+def build_redirects(raw_dir=RAW_DIR, existing=None):
+    redirects = {book: dict(cats) for book, cats in (existing or {}).items()}
+    for book_id in sorted(os.listdir(raw_dir)):
+        book_path = os.path.join(raw_dir, book_id)
+        if not os.path.isdir(book_path):
+            continue
+        for cat_dir in sorted(os.listdir(book_path)):
+            cat_path = os.path.join(book_path, cat_dir)
+            if not os.path.isdir(cat_path) or cat_dir in redirects.get(book_id, {}):
+                continue
+            mapping = legacy_redirects(cat_path)
+            if mapping:
+                redirects.setdefault(book_id, {})[cat_dir] = mapping
+    return redirects
+
+
+def load_redirects(path=REDIRECTS_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def iter_redirects(redirects):
+    """生成 (book_id, category_id, 旧 id, 新 id)"""
+    for book_id, categories in redirects.items():
+        for category_id, mapping in categories.items():
+            for old_id, new_id in mapping.items():
+                yield book_id, category_id, old_id, new_id
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else REDIRECTS_PATH
+    existing = load_redirects(path)
+    redirects = build_redirects(RAW_DIR, existing)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(redirects, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    added = sum(1 for _ in iter_redirects(redirects)) - sum(1 for _ in iter_redirects(existing))
+    print(f'重定向表已写入: {path}（新增 {added} 条）')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+内存后端的段落检索索引
+
+建索引时对每个段落做一次归一化（normalize.py）：文言文和白话文折叠为规范简体字，
+英文折叠为小写的原词段和威妥玛转拼音后的拼音段（见 normalize.fold_english），同时建立倒排表：
+- 汉字逐字倒排（查询中的每个字都必须出现）
+- 英文 / 拼音逐词倒排
+
+查询时先按倒排表求交集（从最短的倒排表开始），再在折叠后的文本上核对完整短语。
+请求期间不再对语料原文做任何转换；原文只在组装命中结果时按章节拆分一次。
+"""
+from array import array
+
+from normalize import fold_chinese, fold_english, normalize_query
+
+
+class SearchIndex:
+    def __init__(self, chapters):
+        """chapters: 可迭代的 (book_id, category_id, Chapter)，Chapter 需带正文"""
+        self.chapters = []      # [(book_id, category_id, Chapter)]
+        self.refs = array('I')  # 段落 -> 章节序号
+        self.positions = array('I')  # 段落 -> 章节内位置（从 1 开始）
+        self.chinese = []       # 段落 -> 折叠后的 "文言文\n白话文"
+        self.latin = []         # 段落 -> ' 折叠后的英文检索词 '（两端加空格便于短语匹配）
+        self.char_postings = {}
+        self.word_postings = {}
+
+        for book_id, category_id, chapter in chapters:
+            ref = len(self.chapters)
+            self.chapters.append((book_id, category_id, chapter))
+            for position, (w, z, e) in enumerate(chapter.segments(), 1):
+                seg_id = len(self.chinese)
+                folded = fold_chinese(w + '\n' + z)
+                words = fold_english(e)
+                self.refs.append(ref)
+                self.positions.append(position)
+                self.chinese.append(folded)
+                self.latin.append(f' {words} ')
+                for ch in set(folded):
+                    if ch.isalnum():
+                        self.char_postings.setdefault(ch, array('I')).append(seg_id)
+                for word in set(words.split()):
+                    self.word_postings.setdefault(word, array('I')).append(seg_id)
+
+    def __len__(self):
+        return len(self.chinese)
+
+    def _candidates(self, chinese, latin):
+        """按倒排表求交集，返回升序的段落编号；某个字 / 词不存在时返回空列表"""
+        postings = []
+        for ch in set(''.join(chinese)):
+            if ch.isalnum():
+                postings.append(self.char_postings.get(ch, ()))
+        for word in set(latin):
+            postings.append(self.word_postings.get(word, ()))
+        if not postings:
+            return []
+        postings.sort(key=len)
+        result = set(postings[0])
+        for p in postings[1:]:
+            if not result:
+                break
+            result.intersection_update(p)
+        return sorted(result)
+
+    def search(self, query, book_id=None, limit=50):
+        """返回 [(book_id, category_id, Chapter, 段落位置), ...]，按语料顺序"""
+        chinese, latin = normalize_query(query)
+        if not chinese and not latin:
+            return []
+        phrase = f' {" ".join(latin)} '
+        results = []
+        for seg_id in self._candidates(chinese, latin):
+            ref = self.refs[seg_id]
+            if book_id and self.chapters[ref][0] != book_id:
+                continue
+            if latin and phrase not in self.latin[seg_id]:
+                continue
+            text = self.chinese[seg_id]
+            if any(term not in text for term in chinese):
+                continue
+            b_id, category_id, chapter = self.chapters[ref]
+            results.append((b_id, category_id, chapter, self.positions[seg_id]))
+            if len(results) >= limit:
+                break
+        return results
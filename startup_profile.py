@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动性能剖析：按阶段记录冷启动时间线（导入、扫描语料、逐书解析、模板编译），
+输出 JSON，并可与预算文件对比，超出阈值时以非零状态退出。
+
+开启方式：
+- app.py / build_static.py：环境变量 STARTUP_PROFILE=<输出路径>（取值为 1 时使用默认文件名）
+- build_static.py 还支持命令行参数 --profile-startup [路径] 和 --check-budget [预算文件]
+
+预算检查：
+    python startup_profile.py check startup_profile_app.json [startup_budget.json]
+
+预算文件格式：{"阶段名或通配符": 毫秒阈值}，如 {"total": 3000, "load_book:*": 800}
+"""
+import fnmatch
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BUDGET_PATH = os.path.join(BASE_DIR, 'startup_budget.json')
+
+# 本模块是入口脚本最先导入的模块之一，以此作为时间线的零点
+_T0 = time.perf_counter()
+
+
+class StartupProfile:
+    """记录启动阶段时间线；阶段数量很少，始终记录，只有开启时才写出文件"""
+
+    def __init__(self, entry, output_path=None):
+        self.entry = entry
+        self.output_path = output_path
+        self.phases = []
+        self._depth = 0
+
+    @property
+    def enabled(self):
+        return self.output_path is not None
+
+    @contextmanager
+    def phase(self, name):
+        record = {'name': name, 'depth': self._depth, 'start_ms': (time.perf_counter() - _T0) * 1000}
+        # 先占位，保证时间线按开始时间排序（嵌套阶段排在父阶段之后）
+        self.phases.append(record)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            record['duration_ms'] = (time.perf_counter() - start) * 1000
+
+    def to_dict(self):
+        return {
+            'entry': self.entry,
+            'python': sys.version.split()[0],
+            'total_ms': round((time.perf_counter() - _T0) * 1000, 3),
+            'phases': [dict(p, start_ms=round(p['start_ms'], 3), duration_ms=round(p.get('duration_ms', 0.0), 3))
+                       for p in self.phases],
+        }
+
+    def write(self):
+        """写出时间线 JSON，返回写出的数据（未开启时返回 None）"""
+        if not self.enabled:
+            return None
+        data = self.to_dict()
+        with open(self.output_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f'启动剖析已写入: {self.output_path} (总计 {data["total_ms"]:.1f} ms)', file=sys.stderr)
+        return data
+
+
+def profile_from_env(entry):
+    """根据 STARTUP_PROFILE 环境变量创建剖析器"""
+    value = os.environ.get('STARTUP_PROFILE', '').strip()
+    if not value or value.lower() in ('0', 'false', 'no', 'off'):
+        return StartupProfile(entry)
+    if value.lower() in ('1', 'true', 'yes', 'on'):
+        value = f'startup_profile_{entry}.json'
+    return StartupProfile(entry, value)
+
+
+def load_budget(path=DEFAULT_BUDGET_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_budget(profile, budget):
+    """
+    对比时间线与预算，返回超出预算的条目列表 [(阶段名, 实际毫秒, 阈值毫秒), ...]
+    预算键 "total" 对应整体启动耗时，其余键按通配符匹配阶段名
+    """
+    violations = []
+    for pattern, limit in budget.items():
+        if pattern == 'total':
+            if profile['total_ms'] > limit:
+                violations.append(('total', profile['total_ms'], limit))
+            continue
+        for p in profile['phases']:
+            if fnmatch.fnmatchcase(p['name'], pattern) and p['duration_ms'] > limit:
+                violations.append((p['name'], p['duration_ms'], limit))
+    return violations
+
+
+def report_budget(profile, budget):
+    """打印预算检查结果，全部通过时返回 True"""
+    violations = check_budget(profile, budget)
+    if not violations:
+        print(f'启动预算检查通过 ({profile["entry"]}: {profile["total_ms"]:.1f} ms)')
+        return True
+    print(f'启动预算检查失败 ({profile["entry"]}):')
+    for name, actual, limit in violations:
+        print(f'  {name}: {actual:.1f} ms > {limit} ms')
+    return False
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != 'check':
+        print('启动剖析工具使用方法:')
+        print('python startup_profile.py check <profile.json> [budget.json]   # 检查启动预算')
+        return 2
+    with open(sys.argv[2], 'r', encoding='utf-8') as f:
+        profile = json.load(f)
+    budget = load_budget(sys.argv[3] if len(sys.argv) > 3 else DEFAULT_BUDGET_PATH)
+    return 0 if report_budget(profile, budget) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存储后端：app.py 和 build_static.py 通过统一接口读取语料
+
+- MemoryBackend: 启动时把 data/raw 全部解析进内存（原有方式）
+- SQLiteBackend: 读取由 ingest 命令生成的 SQLite 数据库，内存中只保留书籍 / 分类 / 章节标题，
+  章节正文按需查询；段落带 FTS5 全文索引，搜索和按书筛选都在 SQL 中完成
+
+SQLite 中汉字逐字以空格分隔后写入 FTS5（unicode61 分词器），查询时同样处理并按短语匹配，
+因此任意长度的中文查询都能命中；英文按单词匹配并忽略变音符号（Hsüan 可用 Hsuan 检索）。
+
+两种后端都在建索引时做检索归一化（见 normalize.py）：繁体 / 异体字折叠为规范字，
+威妥玛拼音转为汉语拼音，查询只归一化一次（漢書 / 汉书、Kao-tsu / gaozu 互相命中）。
+
+用法:
+    python storage.py ingest [data/corpus.sqlite3]     # 从 data/raw 重建数据库
+    STORAGE_BACKEND=sqlite gunicorn app:app            # 以 SQLite 后端运行
+"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+from catalog import BOOK_CONFIGS, Book, Category, Chapter, iter_chapters, iter_loaded_chapters
+from normalize import fold_chinese, fold_english, normalize_query
+from search_index import SearchIndex
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+DEFAULT_SQLITE_PATH = os.path.join(BASE_DIR, 'data', 'corpus.sqlite3')
+
+SEARCH_LIMIT = 50
+
+_HAN_RE = re.compile('([\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\U00020000-\U0003134f])')
+
+SCHEMA = """
+CREATE TABLE books (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE TABLE categories (
+    book_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (book_id, id)
+);
+CREATE TABLE chapters (
+    rowid INTEGER PRIMARY KEY,
+    book_id TEXT NOT NULL,
+    category_id TEXT NOT NULL,
+    chapter_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    UNIQUE (book_id, category_id, chapter_id)
+);
+CREATE TABLE segments (
+    id INTEGER PRIMARY KEY,
+    chapter_rowid INTEGER NOT NULL REFERENCES chapters(rowid),
+    position INTEGER NOT NULL,
+    wenyan TEXT NOT NULL,
+    zh TEXT NOT NULL,
+    en TEXT NOT NULL
+);
+CREATE INDEX segments_by_chapter ON segments (chapter_rowid, position);
+CREATE INDEX chapters_by_book ON chapters (book_id, category_id);
+CREATE VIRTUAL TABLE segments_fts USING fts5 (
+    wenyan, zh, en,
+    content='',
+    tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+
+def fts_text(text):
+    """汉字逐字加空格，使 unicode61 分词器把每个汉字当作一个词"""
+    return _HAN_RE.sub(r' \1 ', text)
+
+
+def fts_query(query):
+    """把用户输入归一化后转成 FTS5 查询：每段汉字和英文词序列各为一个短语，彼此 AND；没有可检索内容时返回 None"""
+    chinese, latin = normalize_query(query)
+    phrases = [re.findall(r'\w+', fts_text(term)) for term in chinese]
+    phrases.append(latin)
+    phrases = ['"' + ' '.join(tokens) + '"' for tokens in phrases if tokens]
+    if not phrases:
+        return None
+    return ' AND '.join(phrases)
+
+
+def chapter_url(book_id, category_id, chapter_id, segment=None):
+    """章节页 URL；给出段落位置时带上该段的锚点 #s{位置}"""
+    url = f'/book/{book_id}/{category_id}/chapter/{chapter_id}/'
+    return url if segment is None else f'{url}#s{segment}'
+
+
+def _hit(book_id, category_id, chapter_id, title, position, wenyan, zh, en):
+    return {
+        'book': book_id, 'category': category_id, 'chapter': chapter_id, 'title': title,
+        'segment': position, 'wenyan': wenyan, 'zh': zh, 'en': en,
+        'url': chapter_url(book_id, category_id, chapter_id, position),
+    }
+
+
+class StorageBackend:
+    """读取接口；返回的 Book / Category / Chapter 均为 catalog.py 中的类型"""
+
+    name = 'base'
+
+    def list_books(self):
+        """书籍目录。SQLite 后端中的章节只有 id 和标题，正文需通过 get_chapter 获取"""
+        raise NotImplementedError
+
+    def get_book(self, book_id):
+        for book in self.list_books():
+            if book.id == book_id:
+                return book
+        return None
+
+    def get_chapter(self, book_id, category_id, chapter_id):
+        """带正文的章节，找不到时返回 None"""
+        raise NotImplementedError
+
+    def full_chapter(self, book, category, chapter):
+        """把目录中的章节补全为带正文的章节"""
+        return self.get_chapter(book.id, category.id, chapter.id)
+
+    def iter_chapters(self, book_id=None, category_id=None):
+        """逐章生成 (book_id, category_id, 带正文的 Chapter)"""
+        raise NotImplementedError
+
+    def search(self, query, book_id=None, limit=SEARCH_LIMIT):
+        """段落检索，返回命中段落 dict 列表（见 _hit）"""
+        raise NotImplementedError
+
+    def warm(self):
+        """预先构建检索所需的索引（默认无需预热）"""
+
+
+class MemoryBackend(StorageBackend):
+    """包装已加载到内存的 Book 列表"""
+
+    name = 'memory'
+
+    def __init__(self, books):
+        self.books = books
+        self._index = None
+        self._lock = threading.Lock()
+
+    def search_index(self):
+        """检索索引在首次搜索时构建"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = SearchIndex(self.iter_chapters())
+        return self._index
+
+    def warm(self):
+        self.search_index()
+
+    def list_books(self):
+        return self.books
+
+    def get_chapter(self, book_id, category_id, chapter_id):
+        book = self.get_book(book_id)
+        category = book.category(category_id) if book else None
+        idx = category.chapter_index(chapter_id) if category else None
+        return None if idx is None else category.chapters[idx]
+
+    def full_chapter(self, book, category, chapter):
+        return chapter
+
+    def iter_chapters(self, book_id=None, category_id=None):
+        return iter_loaded_chapters(self.books, book_id, category_id)
+
+    def search(self, query, book_id=None, limit=SEARCH_LIMIT):
+        results = []
+        segments = {}
+        for b_id, category_id, chapter, position in self.search_index().search(query, book_id, limit):
+            # 同一章节的多个命中只拆分一次正文
+            if chapter not in segments:
+                segments[chapter] = chapter.segments()
+            w, z, e = segments[chapter][position - 1]
+            results.append(_hit(b_id, category_id, chapter.id, chapter.title, position, w, z, e))
+        return results
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    只读 SQLite 后端。每个线程（即每个 gunicorn worker 线程）复用一个只读连接，
+    目录结构在首次访问时读入并缓存。
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'数据库不存在: {path}，请先运行 python storage.py ingest')
+        self.path = path
+        self._local = threading.local()
+        self._books = None
+        self._lock = threading.Lock()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, check_same_thread=False)
+            conn.execute('PRAGMA query_only = 1')
+            self._local.conn = conn
+        return conn
+
+    def warm(self):
+        self.list_books()
+
+    def list_books(self):
+        if self._books is None:
+            with self._lock:
+                if self._books is None:
+                    self._books = self._load_catalog()
+        return self._books
+
+    def _load_catalog(self):
+        conn = self.connection()
+        chapters = {}
+        for book_id, category_id, chapter_id, title, digest in conn.execute(
+                'SELECT book_id, category_id, chapter_id, title, content_hash FROM chapters '
+                'ORDER BY book_id, category_id, position'):
+            chapters.setdefault((book_id, category_id), []).append(Chapter(chapter_id, title, content_hash=digest))
+        categories = {}
+        for book_id, category_id, title in conn.execute(
+                'SELECT book_id, id, title FROM categories ORDER BY book_id, position'):
+            categories.setdefault(book_id, []).append(
+                Category(category_id, title, chapters.get((book_id, category_id), [])))
+        return [Book(book_id, title, categories.get(book_id, []))
+                for book_id, title in conn.execute('SELECT id, title FROM books ORDER BY position')]
+
+    def _chapter_text(self, rowid, chapter_id, title, num, digest):
+        rows = self.connection().execute(
+            'SELECT wenyan, zh, en FROM segments WHERE chapter_rowid = ? ORDER BY position', (rowid,)).fetchall()
+        return Chapter(chapter_id, title,
+                       '\n\n'.join(r[0] for r in rows), '\n\n'.join(r[1] for r in rows), '\n\n'.join(r[2] for r in rows),
+                       num=num, content_hash=digest)
+
+    def get_chapter(self, book_id, category_id, chapter_id):
+        row = self.connection().execute(
+            'SELECT rowid, title, position, content_hash FROM chapters '
+            'WHERE book_id = ? AND category_id = ? AND chapter_id = ?',
+            (book_id, category_id, str(chapter_id))).fetchone()
+        if row is None:
+            return None
+        return self._chapter_text(row[0], str(chapter_id), *row[1:])
+
+    def iter_chapters(self, book_id=None, category_id=None):
+        sql = 'SELECT rowid, book_id, category_id, chapter_id, title, position, content_hash FROM chapters'
+        clauses, params = [], []
+        if book_id:
+            clauses.append('book_id = ?')
+            params.append(book_id)
+        if category_id:
+            clauses.append('category_id = ?')
+            params.append(category_id)
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        # 先取出章节列表，再逐章查询正文，避免同一连接上游标嵌套
+        rows = self.connection().execute(sql + ' ORDER BY book_id, category_id, position', params).fetchall()
+        for rowid, b_id, c_id, chapter_id, title, num, digest in rows:
+            yield b_id, c_id, self._chapter_text(rowid, chapter_id, title, num, digest)
+
+    def search(self, query, book_id=None, limit=SEARCH_LIMIT):
+        match = fts_query(query)
+        if match is None:
+            return []
+        sql = ('SELECT c.book_id, c.category_id, c.chapter_id, c.title, s.position, s.wenyan, s.zh, s.en '
+               'FROM segments_fts JOIN segments s ON s.id = segments_fts.rowid '
+               'JOIN chapters c ON c.rowid = s.chapter_rowid '
+               'WHERE segments_fts MATCH ?')
+        params = [match]
+        if book_id:
+            sql += ' AND c.book_id = ?'
+            params.append(book_id)
+        sql += ' ORDER BY s.id LIMIT ?'
+        params.append(limit)
+        return [_hit(*row) for row in self.connection().execute(sql, params)]
+
+
+def ingest(raw_dir=RAW_DIR, db_path=DEFAULT_SQLITE_PATH):
+    """从 data/raw 重建数据库：先写临时文件再原子替换，运行中的只读连接不受影响"""
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(SCHEMA)
+
+    books, categories = {}, set()
+    chapter_count = segment_count = 0
+    with conn:
+        for book_id, category_id, chapter in iter_chapters(raw_dir):
+            config = BOOK_CONFIGS.get(book_id, {"name": book_id, "categories": {}})
+            if book_id not in books:
+                books[book_id] = len(books)
+                conn.execute('INSERT INTO books VALUES (?, ?, ?)', (book_id, config['name'], books[book_id]))
+            if (book_id, category_id) not in categories:
+                categories.add((book_id, category_id))
+                conn.execute('INSERT INTO categories VALUES (?, ?, ?, ?)',
+                             (book_id, category_id, config['categories'].get(category_id, category_id),
+                              len(categories)))
+            rowid = conn.execute(
+                'INSERT INTO chapters (book_id, category_id, chapter_id, position, title, content_hash) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (book_id, category_id, chapter.id, chapter.num, chapter.title, chapter.content_hash)).lastrowid
+            for position, (w, z, e) in enumerate(chapter.segments(), 1):
+                segment_id = conn.execute(
+                    'INSERT INTO segments (chapter_rowid, position, wenyan, zh, en) VALUES (?, ?, ?, ?, ?)',
+                    (rowid, position, w, z, e)).lastrowid
+                conn.execute('INSERT INTO segments_fts (rowid, wenyan, zh, en) VALUES (?, ?, ?, ?)',
+                             (segment_id, fts_text(fold_chinese(w)), fts_text(fold_chinese(z)), fold_english(e)))
+                segment_count += 1
+            chapter_count += 1
+        conn.execute("INSERT INTO segments_fts (segments_fts) VALUES ('optimize')")
+    conn.execute('VACUUM')
+    conn.close()
+    os.replace(tmp_path, db_path)
+    print(f'已写入 {db_path}: {len(books)} 本书, {chapter_count} 章, {segment_count} 段')
+
+
+def backend_from_env(load_books):
+    """
+    根据 STORAGE_BACKEND 环境变量创建后端（memory | sqlite，默认 memory）
+    load_books: 无参函数，memory 后端用它加载全部语料
+    """
+    kind = os.environ.get('STORAGE_BACKEND', 'memory').strip().lower()
+    if kind == 'sqlite':
+        return SQLiteBackend(os.environ.get('SQLITE_PATH', DEFAULT_SQLITE_PATH))
+    if kind != 'memory':
+        raise ValueError(f'未知的存储后端: {kind}')
+    return MemoryBackend(load_books())
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == 'ingest':
+        ingest(RAW_DIR, sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SQLITE_PATH)
+        return
+    print('存储工具使用方法:')
+    print('python storage.py ingest [db_path]     # 从 data/raw 重建 SQLite 数据库')
+
+
+if __name__ == '__main__':
+    main()
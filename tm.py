@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+翻译记忆：给出一句文言文，找出语料中最相似的已有句子及其对齐的白话文和英文
+
+- 文言文段落按 。！？； 切分成句，逐句建立二元组（相邻两字）倒排索引，字形先经 normalize.fold_chinese 折叠
+- 查询时先按共享二元组数量选出候选句（NumPy bincount），
+  只对候选句计算编辑距离，相似度 = 1 - 编辑距离 / 较长句长度
+- 白话文和英文按段落对齐，命中句返回所在段落的完整译文
+
+用法:
+    python tm.py "赐民爵一级"                 # 前 5 个最相似的句子
+    python tm.py "大赦天下" -k 10
+    python tm.py --file draft.txt            # 整章草稿逐句匹配
+"""
+import os
+import re
+import sys
+from array import array
+
+import numpy as np
+
+from normalize import fold_chinese
+from storage import _hit
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(BASE_DIR, 'data', 'raw')
+
+TOP_K = 5
+MIN_SCORE = 0.3
+CANDIDATES = 64
+
+_SENTENCE_END_RE = re.compile(r'(?<=[。！？；!?;])')
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def split_sentences(text):
+    """按句末标点切分，保留标点；空白句丢弃"""
+    return [s.strip() for s in _SENTENCE_END_RE.split(text) if s.strip()]
+
+
+def match_key(sentence):
+    """用于比较的形式：折叠异体字并去掉标点和空白"""
+    return _NON_WORD_RE.sub('', fold_chinese(sentence))
+
+
+def bigrams(key):
+    if len(key) == 1:
+        return {key}
+    return {key[i:i + 2] for i in range(len(key) - 1)}
+
+
+def edit_distance(a, b, limit=None):
+    """
+    Levenshtein 编辑距离。给出 limit 时只计算对角线两侧 limit 宽的带状区域，
+    距离超过 limit 即提前返回 limit + 1
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    n, m = len(a), len(b)
+    if limit is None:
+        limit = n
+    if n - m > limit:
+        return limit + 1
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(m + 1)]
+    for i in range(1, n + 1):
+        ca = a[i - 1]
+        lo, hi = max(1, i - limit), min(m, i + limit)
+        current = [over] * (m + 1)
+        current[0] = i if i <= limit else over
+        best = current[0]
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > limit:
+            return over
+        previous = current
+    return min(previous[m], over)
+
+
+def similarity(a, b):
+    longest = max(len(a), len(b))
+    return 1.0 - edit_distance(a, b) / longest if longest else 0.0
+
+
+class TranslationMemory:
+    def __init__(self, chapters):
+        """chapters: 可迭代的 (book_id, category_id, Chapter)，Chapter 需带正文"""
+        self.chapters = []             # [(book_id, category_id, Chapter)]
+        self.sentences = []            # 句子原文
+        self.keys = []                 # 句子比较形式
+        self.sentence_ref = array('I')  # 句子 -> 章节序号
+        self.sentence_pos = array('I')  # 句子 -> 章节内段落位置（从 1 开始）
+        postings = {}
+
+        for book_id, category_id, chapter in chapters:
+            ref = len(self.chapters)
+            self.chapters.append((book_id, category_id, chapter))
+            for position, wenyan in enumerate(chapter.wenyan.split('\n\n'), 1):
+                for sentence in split_sentences(wenyan):
+                    key = match_key(sentence)
+                    if not key:
+                        continue
+                    sid = len(self.keys)
+                    self.sentences.append(sentence)
+                    self.keys.append(key)
+                    self.sentence_ref.append(ref)
+                    self.sentence_pos.append(position)
+                    for gram in bigrams(key):
+                        postings.setdefault(gram, array('I')).append(sid)
+
+        self.postings = {gram: np.frombuffer(ids, dtype=np.uint32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _candidates(self, key):
+        """按共享二元组数量取前 CANDIDATES 个候选句"""
+        lists = [self.postings[g] for g in bigrams(key) if g in self.postings]
+        if not lists:
+            return []
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.keys))
+        n = min(CANDIDATES, int(np.count_nonzero(counts)))
+        top = np.argpartition(-counts, n - 1)[:n]
+        return top[np.argsort(-counts[top], kind='stable')].tolist()
+
+    def lookup(self, sentence, k=TOP_K, min_score=MIN_SCORE):
+        """
+        返回最相似的 k 个句子: [{'score', 'match', 'book', 'category', 'chapter', 'title',
+        'segment', 'wenyan', 'zh', 'en', 'url'}, ...]，按相似度降序
+        """
+        key = match_key(sentence)
+        if not key:
+            return []
+        scored = []
+        floor = min_score
+        for sid in self._candidates(key):
+            other = self.keys[sid]
+            longest = max(len(key), len(other))
+            # 只需判断能否超过当前第 k 名（或 min_score），不必算完整的编辑距离
+            limit = int(longest * (1 - floor))
+            distance = edit_distance(key, other, limit)
+            if distance > limit:
+                continue
+            scored.append((1.0 - distance / longest, sid))
+            if len(scored) >= k:
+                scored.sort(key=lambda item: (-item[0], item[1]))
+                del scored[k:]
+                floor = max(floor, scored[-1][0])
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [self._result(sid, score) for score, sid in scored[:k]]
+
+    def lookup_batch(self, text, k=TOP_K, min_score=MIN_SCORE):
+        """整章草稿逐句匹配：[{'sentence': 句子, 'matches': [...]}, ...]"""
+        sentences = text if isinstance(text, list) else split_sentences(text)
+        return [{'sentence': s, 'matches': self.lookup(s, k, min_score)} for s in sentences]
+
+    def _result(self, sid, score):
+        book_id, category_id, chapter = self.chapters[self.sentence_ref[sid]]
+        position = self.sentence_pos[sid]
+        w, z, e = chapter.segments()[position - 1]
+        hit = _hit(book_id, category_id, chapter.id, chapter.title, position, w, z, e)
+        hit['score'] = round(score, 4)
+        hit['match'] = self.sentences[sid]
+        return hit
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        print('翻译记忆工具使用方法:')
+        print('python tm.py "文言文句子" [-k 5]')
+        print('python tm.py --file 草稿.txt [-k 3]')
+        return
+    k = TOP_K
+    if '-k' in args:
+        i = args.index('-k')
+        k = int(args[i + 1])
+        del args[i:i + 2]
+
+    from catalog import iter_chapters
+
+    memory = TranslationMemory(iter_chapters(RAW_DIR))
+    if args[0] == '--file':
+        with open(args[1], 'r', encoding='utf-8') as f:
+            results = memory.lookup_batch(f.read(), k)
+    else:
+        results = [{'sentence': ' '.join(args), 'matches': memory.lookup(' '.join(args), k)}]
+
+    for item in results:
+        print(f"【{item['sentence']}】")
+        if not item['matches']:
+            print('  （无相似句）')
+        for hit in item['matches']:
+            print(f"  {hit['score']:.2f}  {hit['match']}  —— {hit['title']} 第{hit['segment']}段")
+            if hit['zh']:
+                print(f"        白话: {hit['zh'][:80]}")
+            if hit['en']:
+                print(f"        英文: {hit['en'][:80]}")
+
+
+if __name__ == '__main__':
+    main()